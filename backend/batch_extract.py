@@ -0,0 +1,136 @@
+import argparse
+import contextlib
+import csv
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from fractions import Fraction
+from backend.chord_extractor import load_score_chords
+from backend.score_cache import ScoreCache
+from backend.tracing import tracer, run_traced, traced_result
+
+# headless extraction over whole libraries of scores
+# python -m backend.batch_extract scores/ "more/**/*.musicxml" -j 8 -f csv -o chords.csv
+
+SCORE_EXTENSIONS = ('.musicxml', '.xml', '.mxl', '.mid', '.midi')
+CSV_FIELDS = ['file', 'part', 'measure', 'offset', 'chord', 'notes']
+
+def find_scores(inputs):
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                paths.extend(os.path.join(root, f) for f in sorted(files) if f.lower().endswith(SCORE_EXTENSIONS))
+        elif os.path.isfile(item):
+            paths.append(item)
+        else:
+            paths.extend(p for p in sorted(glob.glob(item, recursive=True)) if os.path.isfile(p))
+
+    # keep first occurrence when inputs overlap
+    return list(dict.fromkeys(paths))
+
+def process_score(path, simplify_chords=True, cache_dir=None, engine='music21', sonorities=False, part_filter=None, jobs=None, onset_tolerance=None):
+    start = time.perf_counter()
+
+    # music21 and get_score_parts print to stdout, which may be carrying the records
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            cache = ScoreCache(cache_dir) if cache_dir else None
+            rows = load_score_chords(path, simplify_chords, cache, engine, sonorities, part_filter, jobs, onset_tolerance)
+            error = None if rows is not None else "could not parse score"
+        except Exception as e:
+            rows, error = None, f"{type(e).__name__}: {e}"
+
+    records = []
+    for part_name, measure_number, offset, chord_name, notes in rows or []:
+        records.append({
+            'file': path,
+            'part': part_name,  # sonorities list every sounding part, comma separated
+            'measure': measure_number,
+            'offset': float(offset),
+            'chord': chord_name,
+            'notes': notes.split(", "),
+        })
+    return path, records, error, time.perf_counter() - start
+
+def run_batch(paths, jobs=None, simplify_chords=True, cache_dir=None, engine='music21', sonorities=False, part_filter=None, onset_tolerance=None):
+    options = (simplify_chords, cache_dir, engine, sonorities, part_filter)
+    # a single score gets the workers for chord naming instead
+    if jobs == 1 or len(paths) <= 1:
+        for path in paths:
+            yield process_score(path, *options, jobs=jobs, onset_tolerance=onset_tolerance)
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(run_traced, tracer.enabled, process_score, path, *options, onset_tolerance=onset_tolerance) for path in paths]
+        for future in as_completed(futures):
+            yield traced_result(future.result())
+
+class RecordWriter:
+    def __init__(self, out, fmt):
+        self.out = out
+        self.fmt = fmt
+        if fmt == 'csv':
+            self.writer = csv.DictWriter(out, fieldnames=CSV_FIELDS)
+            self.writer.writeheader()
+
+    def write(self, record):
+        if self.fmt == 'csv':
+            self.writer.writerow(dict(record, notes=", ".join(record['notes'])))
+        else:
+            self.out.write(json.dumps(record) + "\n")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m backend.batch_extract', description="Extract chords from MusicXML and MIDI files without the GUI")
+    parser.add_argument('inputs', nargs='+', help="score files, directories or glob patterns")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help="worker processes, a single score uses them for chord naming (1 runs in-process)")
+    parser.add_argument('-f', '--format', choices=['jsonl', 'csv'], default='jsonl')
+    parser.add_argument('-o', '--output', help="output file (default: stdout)")
+    parser.add_argument('--no-simplify', action='store_true', help="keep music21's raw chord names")
+    parser.add_argument('--engine', choices=['music21', 'stream'], default='music21', help="'stream' reads MusicXML incrementally with bounded memory")
+    parser.add_argument('--cache-dir', help="reuse extracted chords of unchanged files from this score cache directory")
+    parser.add_argument('--sonorities', action='store_true', help="combine notes sounding together across parts, including held notes")
+    parser.add_argument('--parts', nargs='+', metavar='PART', help="with --sonorities, only use parts whose label contains one of these")
+    parser.add_argument('--onset-tolerance', type=Fraction, metavar='QUARTERS', help="MIDI notes struck this close together are one chord (default: 1/16)")
+    args = parser.parse_args(argv)
+
+    if args.sonorities and args.engine != 'music21':
+        parser.error("--sonorities needs the music21 engine")
+    if args.parts and not args.sonorities:
+        parser.error("--parts only applies with --sonorities")
+
+    paths = find_scores(args.inputs)
+    if not paths:
+        print("No score files found", file=sys.stderr)
+        return 1
+
+    out = open(args.output, 'w', newline='', encoding='utf-8') if args.output else sys.stdout
+    writer = RecordWriter(out, args.format)
+    failures = 0
+    total_chords = 0
+    batch_start = time.perf_counter()
+
+    try:
+        for path, records, error, elapsed in run_batch(paths, args.jobs, not args.no_simplify, args.cache_dir, args.engine, args.sonorities, args.parts, args.onset_tolerance):
+            if error:
+                failures += 1
+                print(f"FAILED {path} ({elapsed:.2f}s): {error}", file=sys.stderr)
+                continue
+
+            for record in records:
+                writer.write(record)
+            out.flush()
+            total_chords += len(records)
+            print(f"OK {path}: {len(records)} chords in {elapsed:.2f}s", file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print(f"Processed {len(paths)} files ({failures} failed), {total_chords} chords in {time.perf_counter() - batch_start:.2f}s", file=sys.stderr)
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,111 @@
+import shelve
+import threading
+from collections import OrderedDict
+from music21 import pitch, __version__ as music21_version
+
+VERSION_KEY = '__music21_version__'
+KEY_FORMAT = 1  # bump when chord_cache_key changes shape
+
+# bounded LRU cache for chord names, optionally backed by a shelve file so results survive restarts
+class ChordNameCache:
+    def __init__(self, maxsize=4096, path=None):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.entries = OrderedDict()
+        self.store = None
+        self.lock = threading.Lock()
+
+        if path:
+            self.open_store(path)
+
+    def open_store(self, path):
+        self.close_store()
+        try:
+            store = shelve.open(path)
+        except Exception as e:
+            print(f"Could not open chord cache: {e}")
+            return
+
+        # cached names are only valid for the music21 version (and key format) that produced them
+        if store.get(VERSION_KEY) != (music21_version, KEY_FORMAT):
+            store.clear()
+            store[VERSION_KEY] = (music21_version, KEY_FORMAT)
+        self.store = store
+
+    def close_store(self):
+        with self.lock:
+            if self.store is not None:
+                self.store.close()
+                self.store = None
+
+    def get(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+
+            if self.store is not None:
+                value = self.store.get(repr(key))
+                if value is not None:
+                    self.disk_hits += 1
+                    self.hits += 1
+                    self.remember(key, value)
+                    return value
+
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self.lock:
+            self.remember(key, value)
+            if self.store is not None:
+                self.store[repr(key)] = value
+
+    def remember(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = self.disk_hits = 0
+            if self.store is not None:
+                self.store.clear()
+                self.store[VERSION_KEY] = (music21_version, KEY_FORMAT)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'disk_hits': self.disk_hits,
+            'size': len(self.entries),
+            'maxsize': self.maxsize,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+# key: the spellings in input order plus every flag that changes the result
+# returns None for inputs that cannot be keyed so the caller computes them directly
+def chord_cache_key(note_set, key_name, simplify_numeral, simplify_chords):
+    names = []
+    for n in note_set:
+        if isinstance(n, str):
+            names.append(n)
+        elif isinstance(n, pitch.Pitch):
+            names.append(n.nameWithOctave)
+        else:
+            return None
+
+    if not isinstance(key_name, (str, bool, type(None))):
+        return None
+
+    # simplify_numeral only matters when a relationship is computed
+    numeral_flag = bool(simplify_numeral) if key_name else None
+    # note order stays in the key, the enharmonic simplifier can pick a different spelling (and root) for
+    # the same notes in another order
+    return (tuple(names), key_name or None, numeral_flag, bool(simplify_chords))
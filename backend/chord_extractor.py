@@ -1,5 +1,13 @@
+import time
 from music21 import converter, note, chord
+from backend.find_chord import get_chord_names, run_serially, map_in_pool
+from backend.stream_extractor import iter_score_chords, pitched_common_name
+from backend.sonorities import extract_sonorities
+from backend.key_detection import detect_measure_keys, matrix_keys, KEY_WINDOW
+from backend.midi_reader import is_midi_file, iter_midi_parts, pitch_class_matrix
+from backend.tracing import tracer, traced, span
 
+@traced()
 def get_score_parts(score_path):
     try:
         return converter.parse(score_path).parts
@@ -7,12 +15,14 @@ def get_score_parts(score_path):
         print(f"An error occurred: {e}")
         return None
 
-def extract_chords(parts):
+# rows without names, naming a whole batch at once is what lets each distinct chord be named only once
+def walk_chords(parts):
     chords = []
 
     for part in parts:
         for measure in part.getElementsByClass('Measure'):
-            notes_and_chords = measure.flatten().notes
+            with span('flatten'):
+                notes_and_chords = measure.flatten().notes
 
             for element in notes_and_chords:
                 if isinstance(element, note.Rest):
@@ -21,14 +31,34 @@ def extract_chords(parts):
                 if isinstance(element, chord.Chord):
                     measure_number = element.measureNumber
                     offset = element.offset
-                    chord_name = element.pitchedCommonName
                     notes = ", ".join(p.nameWithOctave for p in element.pitches)
 
-                    chords.append((part, measure_number, offset, chord_name, notes))
+                    chords.append((part, measure_number, offset, None, notes))
 
     return chords
 
+@traced()
+def extract_chords(parts, jobs=None):
+    chords = walk_chords(parts)
+    names = pitched_common_names([notes.split(", ") for *_, notes in chords], jobs)
+    return [(part, measure_number, offset, chord_name, notes)
+            for (part, measure_number, offset, _, notes), chord_name in zip(chords, names)]
+
+def name_note_sets(note_sets, jobs=None):
+    return [pitched_common_name(note_set) for note_set in note_sets]
+
+# music21's pitchedCommonName for each note set, every distinct set computed once (across a pool when there are many)
+def pitched_common_names(note_sets, jobs=None):
+    distinct = list(dict.fromkeys(tuple(note_set) for note_set in note_sets))
+    if run_serially(distinct, jobs):
+        computed = name_note_sets(distinct)
+    else:
+        computed = map_in_pool(name_note_sets, distinct, jobs)
+    names = dict(zip(distinct, computed))
+    return [names[tuple(note_set)] for note_set in note_sets]
+
 # used for instruments with multiple clefs (piano, harp, etc.)
+@traced()
 def label_consecutive_parts(parts):
     part_labels = {}
     
@@ -48,3 +78,154 @@ def label_consecutive_parts(parts):
         part.partName = part_labels.get(part, "Unknown Part")
     
 
+
+STREAM_BATCH_SIZE = 500
+PARALLEL_PARTS = 8  # scores with fewer parts are named part by part, bigger ones this many parts at a time
+
+# one batch call per part, repeated sonorities are only named once, rows that already have a name keep it
+def name_rows(chords, simplify_chords, jobs=None):
+    note_sets = [notes.split(", ") for *_, notes in chords]
+    if simplify_chords:
+        names = [name for name, _ in get_chord_names(note_sets, simplify_chords=True, jobs=jobs)]
+    elif any(row[3] is None for row in chords):
+        names = pitched_common_names(note_sets, jobs)
+    else:
+        return [tuple(row) for row in chords]
+    return [(part_name, measure_number, offset, chord_name, notes)
+            for (part_name, measure_number, offset, _, notes), chord_name in zip(chords, names)]
+
+# full pipeline for one score, yields (progress, rows) each time a part is finished
+# progress runs up to 1.0, None while the total is unknown (the stream engine can't know the row count up front)
+# part objects are replaced by their labels so rows can leave the process
+# engine='stream' reads the MusicXML incrementally instead of building a music21 Stream
+# sonorities=True sweeps all parts (or the ones matching part_filter) for vertical sonorities instead, in one batch
+# jobs is the number of worker processes chord naming may use (None for every core, 1 for none)
+# MIDI files are read by midi_reader whatever the engine, onset_tolerance (quarter notes) sets how close together
+# notes have to be struck to count as one chord, sonorities of a MIDI file still go through music21
+# on_parts is called with the parsed parts, so key detection can reuse them instead of parsing the score again
+def iter_chord_batches(score_path, simplify_chords=True, engine='music21', sonorities=False, part_filter=None, jobs=None, onset_tolerance=None,
+                       on_parts=None):
+    if sonorities and engine != 'music21':
+        raise ValueError("Sonority extraction needs the music21 engine")
+
+    if is_midi_file(score_path) and not sonorities:
+        parts = list(iter_midi_parts(score_path, onset_tolerance))
+        for i, (_, chords) in enumerate(parts):
+            yield (i + 1) / len(parts), name_rows(chords, simplify_chords, jobs)
+        if not parts:
+            yield 1.0, []
+        return
+
+    if engine == 'stream':
+        chords = []
+        for row in iter_score_chords(score_path):
+            chords.append(row)
+            if len(chords) >= STREAM_BATCH_SIZE:
+                yield None, name_rows(chords, simplify_chords, jobs)
+                chords = []
+        yield 1.0, name_rows(chords, simplify_chords, jobs)
+        return
+
+    parts = get_score_parts(score_path)
+    if not parts:
+        raise ValueError(f"Could not read any parts from {score_path}")
+    label_consecutive_parts(parts)
+    if on_parts is not None:
+        on_parts(parts)
+
+    if sonorities:
+        yield 1.0, name_rows(extract_sonorities(parts, part_filter), simplify_chords, jobs)
+        return
+
+    # music21 parts are as costly to send to a worker as to walk, so the walk stays here and the naming,
+    # nearly all of the time, is what gets spread out: a big score is walked and named PARALLEL_PARTS parts
+    # at a time, which gives the pool a block's distinct chords at once and still yields (and can be
+    # cancelled) between blocks
+    if jobs != 1 and len(parts) >= PARALLEL_PARTS:
+        for block_start in range(0, len(parts), PARALLEL_PARTS):
+            block = parts[block_start:block_start + PARALLEL_PARTS]
+            walked = [walk_chords([part]) for part in block]
+            chords = [(part.partName,) + tuple(row) for part, part_chords in zip(block, walked) for _, *row in part_chords]
+            rows = name_rows(chords, simplify_chords, jobs)
+            start = 0
+            for i, part_chords in enumerate(walked):
+                yield (block_start + i + 1) / len(parts), rows[start:start + len(part_chords)]
+                start += len(part_chords)
+        return
+
+    for i, part in enumerate(parts):
+        chords = [(part.partName,) + tuple(row) for _, *row in walk_chords([part])]
+        yield (i + 1) / len(parts), name_rows(chords, simplify_chords, jobs)
+
+# same as iter_chord_batches, but unchanged files are answered from a ScoreCache in a single batch
+# the rows are only cached once every batch has been consumed, so an abandoned load never stores a partial score
+def load_chord_batches(score_path, simplify_chords=True, cache=None, engine='music21', sonorities=False, part_filter=None, jobs=None, onset_tolerance=None,
+                       on_parts=None):
+    options = {'simplify_chords': simplify_chords, 'engine': engine}
+    if sonorities:
+        options.update(sonorities=True, part_filter=tuple(part_filter or ()))
+    elif onset_tolerance is not None and is_midi_file(score_path):
+        options.update(onset_tolerance=str(onset_tolerance))
+
+    cache_key = None
+    if cache is not None:
+        try:
+            cache_key = cache.key(score_path, **options)
+        except OSError:
+            pass
+
+    if cache_key is not None:
+        start = time.perf_counter()
+        rows = cache.get(cache_key)
+        # hits and misses are counted by the tracer (and cache.stats()), not printed
+        if tracer.enabled:
+            tracer.record('score_cache_hit' if rows is not None else 'score_cache_miss', start, time.perf_counter(), {'path': score_path})
+        if rows is not None:
+            yield 1.0, rows
+            return
+
+    rows = []
+    for progress, batch in iter_chord_batches(score_path, simplify_chords, engine, sonorities, part_filter, jobs, onset_tolerance, on_parts):
+        rows.extend(batch)
+        yield progress, batch
+
+    if cache_key is not None:
+        cache.put(cache_key, rows)
+
+# measure number -> detected key, cached next to the rows under its own options
+# parts the extraction already parsed are used as they are, otherwise the score is parsed here
+def load_measure_keys(score_path, window=KEY_WINDOW, cache=None, parts=None):
+    cache_key = None
+    if cache is not None:
+        try:
+            cache_key = cache.key(score_path, measure_keys=True, window=window)
+        except OSError:
+            pass
+
+    if cache_key is not None:
+        keys = cache.get(cache_key)
+        if keys is not None:
+            return keys
+
+    if is_midi_file(score_path):
+        keys = matrix_keys(*pitch_class_matrix(score_path), window)
+    else:
+        parts = parts or get_score_parts(score_path)
+        if not parts:
+            raise ValueError(f"Could not read any parts from {score_path}")
+        keys = detect_measure_keys(parts, window)
+
+    if cache_key is not None:
+        cache.put(cache_key, keys)
+    return keys
+
+def load_score_chords(score_path, simplify_chords=True, cache=None, engine='music21', sonorities=False, part_filter=None, jobs=None, onset_tolerance=None):
+    try:
+        batches = load_chord_batches(score_path, simplify_chords, cache, engine, sonorities, part_filter, jobs, onset_tolerance)
+        return [row for _, batch in batches for row in batch]
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return None
+
+def extract_score_chords(score_path, simplify_chords=True, engine='music21', sonorities=False, part_filter=None, jobs=None, onset_tolerance=None):
+    return load_score_chords(score_path, simplify_chords, None, engine, sonorities, part_filter, jobs, onset_tolerance)
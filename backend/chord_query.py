@@ -0,0 +1,161 @@
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from backend.chord_store import ChordTable, NO_MEASURE
+
+# filter engine for extracted chord rows (part, measure, offset, chord name, notes), extended as a score loads
+# answers the extractor's filter boxes without scanning every row on every keystroke
+# the indexes are built from the ChordTable's columns and filter() hands back a view, no row tuples are built
+
+BY_INSTRUMENT = "By Instrument"
+BY_MEASURE_AND_BEAT = "By Measure and Beat"
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+# '' means no bound, anything but digits matches nothing (same as the filter boxes always behaved)
+def parse_bound(text):
+    if not text:
+        return True, None
+    if not text.isdigit():
+        return False, None
+    return True, int(text)
+
+class ChordQuery:
+    def __init__(self, rows):
+        self.rows = rows if isinstance(rows, ChordTable) else ChordTable(rows)
+        self.indexed = 0  # rows of the table covered by the indexes
+        self.sorted_count = 0  # rows covered by the sorted orders, which are only rebuilt when a filter needs them
+
+        # table order is the row indices themselves, the measure/beat order is sorted on demand
+        self.orders = {BY_INSTRUMENT: [], BY_MEASURE_AND_BEAT: []}
+        self.measure_rank = []
+        self.measure_order = self.orders[BY_MEASURE_AND_BEAT]
+        self.measure_keys = []
+        self.offset_order = []
+        self.offset_keys = []
+
+        # inverted indexes over the interned ids, substring search then only looks at distinct values
+        self.part_labels = {}  # part id -> lower case label
+        self.part_rows = defaultdict(list)
+        self.name_labels = {}  # name id -> lower case name
+        self.name_rows = defaultdict(list)
+        self.names = []
+        self.name_trigrams = defaultdict(set)
+
+        self.extend()
+
+    # indexes the rows appended to the table since the last call, a score still loading costs only its new rows
+    def extend(self):
+        table = self.rows
+        start, count = self.indexed, len(table)
+        self.orders[BY_INSTRUMENT].extend(range(start, count))
+
+        for i in range(start, count):
+            part_id = table.parts[i]
+            label = self.part_labels.get(part_id)
+            if label is None:
+                label = self.part_labels[part_id] = table.part_names.values[part_id].lower()
+            self.part_rows[label].append(i)
+
+            name_id = table.names[i]
+            name = self.name_labels.get(name_id)
+            if name is None:
+                name = self.name_labels[name_id] = table.chord_names.values[name_id].lower()
+                if name not in self.name_rows:
+                    for gram in trigrams(name):
+                        self.name_trigrams[gram].add(len(self.names))
+                    self.names.append(name)
+            self.name_rows[name].append(i)
+        self.indexed = count
+
+    def sort_rows(self):
+        if self.sorted_count == self.indexed:
+            return
+        count = self.indexed
+        measures = self.rows.measures
+        offsets = self.rows.offsets
+
+        self.measure_order = sorted(range(count), key=lambda i: (measures[i], offsets[i]))
+        self.orders[BY_MEASURE_AND_BEAT] = self.measure_order
+        self.measure_rank = [0] * count
+        for position, i in enumerate(self.measure_order):
+            self.measure_rank[i] = position
+
+        # measure ranges are contiguous in measure order, beats get their own sorted index
+        self.measure_keys = [measures[i] for i in self.measure_order]
+        self.offset_order = sorted(range(count), key=offsets.__getitem__)
+        self.offset_keys = [offsets[i] for i in self.offset_order]
+        self.sorted_count = count
+
+    # chords without a measure number sort first and are outside every measure range
+    def measure_range(self, low, high):
+        start = bisect_right(self.measure_keys, NO_MEASURE) if low is None else bisect_left(self.measure_keys, low)
+        end = len(self.measure_keys) if high is None else bisect_right(self.measure_keys, high)
+        return self.measure_order[start:end]
+
+    def offset_range(self, low, high):
+        start = 0 if low is None else bisect_left(self.offset_keys, low)
+        end = len(self.offset_keys) if high is None else bisect_right(self.offset_keys, high)
+        return self.offset_order[start:end]
+
+    def rows_for_part(self, text):
+        matches = []
+        for part, rows in self.part_rows.items():
+            if text in part:
+                matches.extend(rows)
+        return matches
+
+    def rows_for_name(self, text):
+        if len(text) >= 3:
+            # every trigram of the query has to appear in the name, then confirm the substring
+            postings = sorted((self.name_trigrams.get(gram, set()) for gram in trigrams(text)), key=len)
+            candidates = set.intersection(*postings) if postings else set()
+            names = (self.names[name_id] for name_id in candidates)
+        else:
+            names = self.names
+
+        matches = []
+        for name in names:
+            if text in name:
+                matches.extend(self.name_rows[name])
+        return matches
+
+    # within limits the result to a set of row indices worked out elsewhere (progression matches)
+    def filter(self, order=BY_INSTRUMENT, part='', measure_from='', measure_until='', beat_from='', beat_until='', chord='', within=None):
+        bounds = [parse_bound(text) for text in (measure_from, measure_until, beat_from, beat_until)]
+        if not all(valid for valid, _ in bounds):
+            return self.rows.select([])
+        measure_low, measure_high, beat_low, beat_high = (value for _, value in bounds)
+
+        if order == BY_MEASURE_AND_BEAT or any(value is not None for _, value in bounds):
+            self.sort_rows()
+
+        ordered = None
+        constraints = []
+        if measure_low is not None or measure_high is not None:
+            in_range = self.measure_range(measure_low, measure_high)
+            if order == BY_MEASURE_AND_BEAT:
+                ordered = in_range
+            else:
+                constraints.append(in_range)
+        if beat_low is not None or beat_high is not None:
+            constraints.append(self.offset_range(beat_low, beat_high))
+        if part:
+            constraints.append(self.rows_for_part(part.lower()))
+        if chord:
+            constraints.append(self.rows_for_name(chord.lower()))
+        if within is not None:
+            constraints.append(within)
+
+        if ordered is None and not constraints:
+            return self.rows.select(self.orders[order])
+
+        # smallest constraint first keeps the intersection cheap
+        sets = sorted((set(c) for c in constraints), key=len)
+        if ordered is not None:
+            matches = [i for i in ordered if all(i in s for s in sets)]
+        else:
+            matches = set.intersection(*sets)
+            # table order is plain index order
+            matches = sorted(matches, key=self.measure_rank.__getitem__) if order == BY_MEASURE_AND_BEAT else sorted(matches)
+        return self.rows.select(matches)
@@ -0,0 +1,138 @@
+import re
+from array import array
+
+# extracted chord rows stored by column instead of as one tuple of strings per row
+# part labels, chord names and note spellings are interned, so a row costs a few array slots plus its notes
+# rows still read back as (part, measure, offset, chord name, notes) tuples, built only when asked for,
+# so anything that takes a list of rows (ChordQuery, VirtualTable, the cache) takes a ChordTable too
+
+NOTE_PATTERN = re.compile(r'^([A-Ga-g])([#\-~`]*)(-?\d+)?$')
+STEP_SEMITONES = {'C': 0, 'D': 2, 'E': 4, 'F': 5, 'G': 7, 'A': 9, 'B': 11}
+NO_MIDI = -1
+NO_MEASURE = -2 ** 63  # chords outside a Measure have no number, they sort before measure 0
+
+# nearest MIDI number for a nameWithOctave spelling, music21's implicit octave 4 when there's none
+def spelling_to_midi(spelling):
+    match = NOTE_PATTERN.match(spelling)
+    if not match:
+        return NO_MIDI
+    step, accidentals, octave = match.groups()
+    alter = accidentals.count('#') - accidentals.count('-') + 0.5 * (accidentals.count('~') - accidentals.count('`'))
+    return round(12 * (int(octave or 4) + 1) + STEP_SEMITONES[step.upper()] + alter)
+
+class Interned:
+    def __init__(self):
+        self.values = []
+        self.ids = {}
+
+    def id(self, value):
+        value_id = self.ids.get(value)
+        if value_id is None:
+            value_id = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return value_id
+
+class ChordTable:
+    def __init__(self, rows=()):
+        self.part_names = Interned()
+        self.chord_names = Interned()
+        self.spellings = Interned()
+        self.spelling_midi = array('h')  # spelling id -> MIDI number
+
+        self.parts = array('I')
+        self.measures = array('q')
+        self.offsets = array('d')
+        self.exact_offsets = {}  # row -> offset, for offsets a float can't give back exactly (triplets)
+        self.names = array('I')
+
+        # notes of row i are note_spellings[note_starts[i]:note_starts[i + 1]], lowest first
+        self.note_starts = array('I', [0])
+        self.note_spellings = array('I')
+
+        self.extend(rows)
+
+    def __len__(self):
+        return len(self.parts)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.row(j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("chord row out of range")
+        return self.row(i)
+
+    def __iter__(self):
+        return (self.row(i) for i in range(len(self)))
+
+    def append(self, row):
+        part_name, measure_number, offset, chord_name, notes = row
+        self.parts.append(self.part_names.id(part_name))
+        self.measures.append(NO_MEASURE if measure_number is None else measure_number)
+        self.offsets.append(float(offset))
+        if not isinstance(offset, (int, float)):
+            self.exact_offsets[len(self.parts) - 1] = offset
+        self.names.append(self.chord_names.id(chord_name))
+
+        for spelling in (notes.split(", ") if isinstance(notes, str) else notes):
+            spelling_id = self.spellings.id(spelling)
+            if spelling_id == len(self.spelling_midi):
+                self.spelling_midi.append(spelling_to_midi(spelling))
+            self.note_spellings.append(spelling_id)
+        self.note_starts.append(len(self.note_spellings))
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def part(self, i):
+        return self.part_names.values[self.parts[i]]
+
+    def measure(self, i):
+        number = self.measures[i]
+        return None if number == NO_MEASURE else number
+
+    def offset(self, i):
+        return self.exact_offsets.get(i, self.offsets[i])
+
+    def chord_name(self, i):
+        return self.chord_names.values[self.names[i]]
+
+    def notes(self, i):
+        values = self.spellings.values
+        return [values[s] for s in self.note_spellings[self.note_starts[i]:self.note_starts[i + 1]]]
+
+    def midi(self, i):
+        midi = self.spelling_midi
+        return [midi[s] for s in self.note_spellings[self.note_starts[i]:self.note_starts[i + 1]]]
+
+    def notes_text(self, i):
+        return ", ".join(self.notes(i))
+
+    def row(self, i):
+        return (self.part(i), self.measure(i), self.offset(i), self.chord_name(i), self.notes_text(i))
+
+    # the rows at the given indices, in that order, without copying them out
+    def select(self, indices):
+        return ChordRows(self, indices)
+
+class ChordRows:
+    def __init__(self, table, indices):
+        self.table = table
+        self.indices = indices
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.table.row(j) for j in self.indices[i]]
+        return self.table.row(self.indices[i])
+
+    def __iter__(self):
+        return (self.table.row(i) for i in self.indices)
+
+    # index into the underlying ChordTable
+    def table_index(self, i):
+        return self.indices[i]
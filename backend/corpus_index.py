@@ -0,0 +1,313 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from fractions import Fraction
+from backend.batch_extract import find_scores, run_batch, RecordWriter
+from backend.chord_store import spelling_to_midi, NO_MIDI
+from backend.midi_reader import is_midi_file
+from backend.score_cache import content_hash
+from backend.tracing import traced
+
+# chords of a whole corpus in one SQLite file, so questions about many scores don't mean opening each one
+# python -m backend.corpus_index index scores/ -j 8
+# python -m backend.corpus_index query --chord "dominant seventh" --measures 1-40
+# indexing runs the batch extractor, files whose content hash and extraction options are unchanged are skipped
+# part labels and chord names are interned in their own tables: a substring search only scans the distinct
+# values and the chord rows are then found through the (name_id, measure) and (part_id) indexes
+
+DEFAULT_DB = 'chord_index.sqlite'
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    hash TEXT NOT NULL,
+    options TEXT NOT NULL,
+    chords INTEGER NOT NULL,
+    indexed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS parts (id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL);
+CREATE TABLE IF NOT EXISTS names (id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL);
+CREATE TABLE IF NOT EXISTS chords (
+    file_id INTEGER NOT NULL,
+    part_id INTEGER NOT NULL,
+    measure INTEGER,
+    offset REAL NOT NULL,
+    name_id INTEGER NOT NULL,
+    pcset INTEGER,
+    notes TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chords_file ON chords (file_id, measure, offset);
+CREATE INDEX IF NOT EXISTS chords_part ON chords (part_id, measure);
+CREATE INDEX IF NOT EXISTS chords_measure ON chords (measure, offset);
+CREATE INDEX IF NOT EXISTS chords_name ON chords (name_id, measure);
+CREATE INDEX IF NOT EXISTS chords_pcset ON chords (pcset, measure);
+"""
+
+# pitch classes as a 12-bit mask, same layout as the chord lookup table, None if a note can't be read
+def pitch_class_set(spellings):
+    mask = 0
+    for spelling in spellings:
+        midi = spelling_to_midi(spelling.strip())
+        if midi == NO_MIDI:
+            return None
+        mask |= 1 << (midi % 12)
+    return mask
+
+# LIKE pattern matching text anywhere, its own %, _ and backslashes are escaped
+def like_pattern(text):
+    return '%' + text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+# '1-40', '5-', '-12' or '7', either end may be missing
+def parse_range(text):
+    low, separator, high = text.partition('-')
+    if not separator:
+        high = low
+    try:
+        return (int(low) if low else None), (int(high) if high else None)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a number or a range like 1-40, got {text!r}")
+
+class ChordIndex:
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+
+        version = self.connection.execute("SELECT value FROM meta WHERE key = 'schema'").fetchone()
+        if version is None:
+            self.connection.execute("INSERT INTO meta VALUES ('schema', ?)", (str(SCHEMA_VERSION),))
+            self.connection.commit()
+        elif int(version[0]) != SCHEMA_VERSION:
+            raise ValueError(f"{path} was written by a different version of the index, delete it and index again")
+        self.interned = {'parts': {}, 'names': {}}
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def intern(self, table, value):
+        ids = self.interned[table]
+        value_id = ids.get(value)
+        if value_id is None:
+            self.connection.execute(f"INSERT OR IGNORE INTO {table} (name) VALUES (?)", (value,))
+            value_id = self.connection.execute(f"SELECT id FROM {table} WHERE name = ?", (value,)).fetchone()[0]
+            ids[value] = value_id
+        return value_id
+
+    def indexed_files(self):
+        return {path: (file_id, file_hash, options) for file_id, path, file_hash, options
+                in self.connection.execute("SELECT id, path, hash, options FROM files")}
+
+    def remove_file(self, path):
+        row = self.connection.execute("SELECT id FROM files WHERE path = ?", (path,)).fetchone()
+        if row:
+            self.connection.execute("DELETE FROM chords WHERE file_id = ?", row)
+            self.connection.execute("DELETE FROM files WHERE id = ?", row)
+
+    # replaces whatever was indexed for the file, in one transaction
+    # a rolled back transaction takes its new part and name rows with it, so the interned ids are forgotten too
+    def store_file(self, path, file_hash, options, records):
+        try:
+            with self.connection:
+                self.remove_file(path)
+                cursor = self.connection.execute(
+                    "INSERT INTO files (path, hash, options, chords, indexed_at) VALUES (?, ?, ?, ?, ?)",
+                    (path, file_hash, options, len(records), time.time()))
+                file_id = cursor.lastrowid
+                self.connection.executemany(
+                    "INSERT INTO chords (file_id, part_id, measure, offset, name_id, pcset, notes) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    ((file_id, self.intern('parts', record['part']), record['measure'], record['offset'],
+                      self.intern('names', record['chord']), pitch_class_set(record['notes']), ", ".join(record['notes']))
+                     for record in records))
+        except Exception:
+            self.interned = {'parts': {}, 'names': {}}
+            raise
+
+    def matching_ids(self, table, text):
+        # LIKE is case-insensitive, the same as the extractor's filter boxes
+        return [row[0] for row in self.connection.execute(f"SELECT id FROM {table} WHERE name LIKE ? ESCAPE '\\'", (like_pattern(text),))]
+
+    # records in the batch extractor's format, ordered by file, measure and offset
+    @traced('corpus_query')
+    def query(self, chord=None, part=None, measure_from=None, measure_until=None, beat_from=None, beat_until=None,
+              pitch_classes=None, file=None, limit=None):
+        conditions = []
+        parameters = []
+
+        for table, column, text in (('names', 'name_id', chord), ('parts', 'part_id', part)):
+            if text:
+                ids = self.matching_ids(table, text)
+                if not ids:
+                    return []
+                conditions.append(f"c.{column} IN ({', '.join('?' * len(ids))})")
+                parameters.extend(ids)
+
+        for column, operator, value in (('measure', '>=', measure_from), ('measure', '<=', measure_until),
+                                        ('offset', '>=', beat_from), ('offset', '<=', beat_until)):
+            if value is not None:
+                conditions.append(f"c.{column} {operator} ?")
+                parameters.append(value)
+
+        if pitch_classes:
+            mask = pitch_class_set(pitch_classes)
+            if mask is None:
+                raise ValueError(f"could not read the notes {', '.join(pitch_classes)}")
+            conditions.append("c.pcset = ?")
+            parameters.append(mask)
+
+        if file:
+            conditions.append("f.path LIKE ? ESCAPE '\\'")
+            parameters.append(like_pattern(file))
+
+        sql = ("SELECT f.path, p.name, c.measure, c.offset, n.name, c.notes FROM chords c "
+               "JOIN files f ON f.id = c.file_id JOIN parts p ON p.id = c.part_id JOIN names n ON n.id = c.name_id")
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY f.path, c.measure, c.offset"
+        if limit:
+            sql += " LIMIT ?"
+            parameters.append(limit)
+
+        return [{'file': path, 'part': part_name, 'measure': measure, 'offset': offset, 'chord': name, 'notes': notes.split(", ")}
+                for path, part_name, measure, offset, name, notes in self.connection.execute(sql, parameters)]
+
+    def stats(self):
+        files, chords = self.connection.execute("SELECT COUNT(*), COALESCE(SUM(chords), 0) FROM files").fetchone()
+        names = self.connection.execute("SELECT COUNT(*) FROM names").fetchone()[0]
+        return {'files': files, 'chords': chords, 'distinct_names': names}
+
+# yields (path, status, chord count, seconds) per score, status is 'indexed', 'unchanged', 'removed' or an error
+# the onset tolerance only changes what MIDI files give, so only their options record it
+def index_corpus(index, inputs, jobs=None, simplify_chords=True, engine='music21', sonorities=False, part_filter=None, prune=True,
+                 onset_tolerance=None):
+    options = {'simplify_chords': simplify_chords, 'engine': engine, 'sonorities': sonorities, 'parts': sorted(part_filter or [])}
+    midi_options = dict(options, onset_tolerance=str(onset_tolerance)) if onset_tolerance is not None and not sonorities else options
+    file_options = {False: json.dumps(options, sort_keys=True), True: json.dumps(midi_options, sort_keys=True)}
+    indexed = index.indexed_files()
+    paths = [os.path.abspath(path) for path in find_scores(inputs)]
+
+    pending = {}
+    for path in paths:
+        try:
+            file_hash = content_hash(path).hexdigest()
+        except OSError as e:
+            yield path, f"could not read file: {e}", 0, 0.0
+            continue
+        previous = indexed.get(path)
+        if previous and previous[1] == file_hash and previous[2] == file_options[is_midi_file(path)]:
+            yield path, 'unchanged', 0, 0.0
+        else:
+            pending[path] = file_hash
+
+    for path, records, error, elapsed in run_batch(list(pending), jobs, simplify_chords, None, engine, sonorities, part_filter, onset_tolerance):
+        if error:
+            yield path, error, 0, elapsed
+            continue
+        index.store_file(path, pending[path], file_options[is_midi_file(path)], records)
+        yield path, 'indexed', len(records), elapsed
+
+    # scores that were deleted or moved since they were indexed
+    if prune:
+        for path in indexed:
+            if not os.path.exists(path):
+                with index.connection:
+                    index.remove_file(path)
+                yield path, 'removed', 0, 0.0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m backend.corpus_index', description="Index the chords of a corpus of scores in SQLite and query them")
+    parser.add_argument('--db', default=DEFAULT_DB, help=f"index database (default: {DEFAULT_DB})")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    index_parser = commands.add_parser('index', help="extract new and changed scores into the index")
+    index_parser.add_argument('inputs', nargs='+', help="score files, directories or glob patterns")
+    index_parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help="worker processes (1 runs in-process)")
+    index_parser.add_argument('--no-simplify', action='store_true', help="keep music21's raw chord names")
+    index_parser.add_argument('--engine', choices=['music21', 'stream'], default='music21')
+    index_parser.add_argument('--sonorities', action='store_true', help="combine notes sounding together across parts")
+    index_parser.add_argument('--parts', nargs='+', metavar='PART', help="with --sonorities, only use parts whose label contains one of these")
+    index_parser.add_argument('--onset-tolerance', type=Fraction, metavar='QUARTERS', help="MIDI notes struck this close together are one chord (default: 1/16)")
+    index_parser.add_argument('--keep-missing', action='store_true', help="don't drop scores that no longer exist on disk")
+
+    query_parser = commands.add_parser('query', help="find chords across every indexed score")
+    query_parser.add_argument('--chord', help="chord name contains this text")
+    query_parser.add_argument('--part', help="part label contains this text")
+    query_parser.add_argument('--measures', type=parse_range, help="measure range, e.g. 1-40")
+    query_parser.add_argument('--beats', type=parse_range, help="offset range within the measure, e.g. 0-2")
+    query_parser.add_argument('--pitch-classes', help="exact set of pitch classes, e.g. G,B,D,F")
+    query_parser.add_argument('--file', help="file path contains this text")
+    query_parser.add_argument('--limit', type=int)
+    query_parser.add_argument('--count', action='store_true', help="only print how many chords match")
+    query_parser.add_argument('-f', '--format', choices=['jsonl', 'csv'], default='jsonl')
+
+    commands.add_parser('stats', help="summarise the index")
+    args = parser.parse_args(argv)
+
+    if args.command == 'index' and args.sonorities and args.engine != 'music21':
+        parser.error("--sonorities needs the music21 engine")
+    if args.command == 'index' and args.parts and not args.sonorities:
+        parser.error("--parts only applies with --sonorities")
+
+    try:
+        index = ChordIndex(args.db)
+    except (sqlite3.Error, ValueError) as e:
+        print(f"Could not open {args.db}: {e}", file=sys.stderr)
+        return 1
+
+    with index:
+        if args.command == 'stats':
+            print(json.dumps(index.stats()))
+            return 0
+
+        if args.command == 'index':
+            start = time.perf_counter()
+            counts = {}
+            for path, status, chords, elapsed in index_corpus(index, args.inputs, args.jobs, not args.no_simplify, args.engine,
+                                                             args.sonorities, args.parts, not args.keep_missing, args.onset_tolerance):
+                known = status in ('indexed', 'unchanged', 'removed')
+                counts[status if known else 'failed'] = counts.get(status if known else 'failed', 0) + 1
+                if status == 'indexed':
+                    print(f"OK {path}: {chords} chords in {elapsed:.2f}s", file=sys.stderr)
+                elif not known:
+                    print(f"FAILED {path}: {status}", file=sys.stderr)
+            summary = ", ".join(f"{count} {status}" for status, count in sorted(counts.items()))
+            print(f"{summary or 'no scores found'} in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+            return 1 if counts.get('failed') else 0
+
+        measure_from, measure_until = args.measures or (None, None)
+        beat_from, beat_until = args.beats or (None, None)
+        pitch_classes = args.pitch_classes.split(",") if args.pitch_classes else None
+
+        start = time.perf_counter()
+        try:
+            records = index.query(args.chord, args.part, measure_from, measure_until, beat_from, beat_until,
+                                  pitch_classes, args.file, args.limit)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 1
+        elapsed = time.perf_counter() - start
+
+        if args.count:
+            print(len(records))
+        else:
+            writer = RecordWriter(sys.stdout, args.format)
+            for record in records:
+                writer.write(record)
+        print(f"{len(records)} chords in {elapsed * 1000:.1f}ms", file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
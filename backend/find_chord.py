@@ -1,7 +1,106 @@
 from music21 import chord, pitch, key, roman, analysis
+from backend.chord_cache import ChordNameCache, chord_cache_key
+from backend.pcset_table import lookup_chord_name
+from backend.roman_table import key_info, is_diatonic, simplified_numeral
+from backend.tracing import tracer, traced, span, run_traced, traced_result
+from backend.startup import worker_context
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import os
 import re
+import threading
 
+# shared by every caller, the GUI attaches an on-disk store at startup
+chord_name_cache = ChordNameCache()
+
+# unique uncached sonorities needed before get_chord_names uses worker processes, about a quarter second of
+# naming, the pool is kept warm so handing a batch to it costs a few milliseconds
+PARALLEL_THRESHOLD = 500
+
+@traced()
 def get_chord_name(note_set, key_name=None, simplify_numeral=True, simplify_chords=True):
+    cache_key = chord_cache_key(note_set, key_name, simplify_numeral, simplify_chords)
+    if cache_key is None:
+        return compute_chord_name(note_set, key_name, simplify_numeral, simplify_chords)
+
+    result = chord_name_cache.get(cache_key)
+    if result is None:
+        result = compute_chord_name(note_set, key_name, simplify_numeral, simplify_chords)
+        chord_name_cache.put(cache_key, result)
+    return result
+
+# names a whole extraction at once: inputs are canonicalised with the cache key, every distinct
+# sonority is named once (across worker processes when there are enough of them) and the results
+# are scattered back in input order
+@traced()
+def get_chord_names(note_sets, key_name=None, simplify_numeral=True, simplify_chords=True, jobs=None):
+    results = [None] * len(note_sets)
+    positions = {}  # cache key -> indices of note_sets sharing it
+    for i, note_set in enumerate(note_sets):
+        cache_key = chord_cache_key(note_set, key_name, simplify_numeral, simplify_chords)
+        if cache_key is None:
+            results[i] = compute_chord_name(note_set, key_name, simplify_numeral, simplify_chords)
+        else:
+            positions.setdefault(cache_key, []).append(i)
+
+    missing = []
+    for cache_key, indices in positions.items():
+        result = chord_name_cache.get(cache_key)
+        if result is None:
+            missing.append(cache_key)
+        else:
+            for i in indices:
+                results[i] = result
+
+    # the canonical key holds the note names in order, which is all a name depends on
+    computed = compute_chord_names([list(cache_key[0]) for cache_key in missing], key_name, simplify_numeral, simplify_chords, jobs)
+    for cache_key, result in zip(missing, computed):
+        chord_name_cache.put(cache_key, result)
+        for i in positions[cache_key]:
+            results[i] = result
+    return results
+
+def compute_chord_names(note_sets, key_name=None, simplify_numeral=True, simplify_chords=True, jobs=None):
+    if run_serially(note_sets, jobs):
+        return [compute_chord_name(note_set, key_name, simplify_numeral, simplify_chords) for note_set in note_sets]
+    return map_in_pool(compute_chord_names, note_sets, jobs, key_name, simplify_numeral, simplify_chords)
+
+# a worker process (batch_extract) never starts its own pool, and a single core gains nothing from one
+def run_serially(note_sets, jobs):
+    return ((jobs or os.cpu_count() or 1) == 1 or len(note_sets) < PARALLEL_THRESHOLD
+            or multiprocessing.parent_process() is not None)
+
+# pools by worker count, kept for the life of the process so workers stay warm between scores
+pools = {}
+pools_lock = threading.Lock()
+
+def worker_pool(jobs):
+    with pools_lock:
+        if jobs not in pools:
+            pools[jobs] = ProcessPoolExecutor(max_workers=jobs, mp_context=worker_context())
+        return pools[jobs]
+
+# function(chunk, *args, jobs=1) over chunks of note_sets in worker processes, results concatenated in order
+def map_in_pool(function, note_sets, jobs, *args):
+    jobs = jobs or os.cpu_count() or 1
+    chunk = -(-len(note_sets) // (jobs * 4))
+    chunks = [note_sets[i:i + chunk] for i in range(0, len(note_sets), chunk)]
+    results = []
+    executor = worker_pool(jobs)
+    try:
+        futures = [executor.submit(run_traced, tracer.enabled, function, part, *args, jobs=1) for part in chunks]
+        for future in futures:
+            results.extend(traced_result(future.result()))
+    except BrokenProcessPool:
+        # a worker died, the next call starts a fresh pool
+        with pools_lock:
+            if pools.get(jobs) is executor:
+                del pools[jobs]
+        raise
+    return results
+
+def compute_chord_name(note_set, key_name=None, simplify_numeral=True, simplify_chords=True):
     notes = []
     invalid_note_pattern = re.compile(r'\d.*\d')  
     
@@ -26,18 +125,23 @@ def get_chord_name(note_set, key_name=None, simplify_numeral=True, simplify_chor
         return "Chord cannot exceed 16 notes", None
               
     if simplify_chords:
-        pitch_list = [] 
-        for note in notes:
-            p = pitch.Pitch(note)
-            pitch_list.append(p) 
-
-        # simplify the pitch list (for notes with 2+ accidentals)
-        simplified_notes = [str(p.simplifyEnharmonic(mostCommon=True)) for p in pitch_list]
-        es = analysis.enharmonics.EnharmonicSimplifier(simplified_notes)
-        notes= es.bestPitches()
-
-    c = chord.Chord(notes)
-    chord_name = c.pitchedCommonName
+        with span('simplify_enharmonics'):
+            pitch_list = [] 
+            for note in notes:
+                p = pitch.Pitch(note)
+                pitch_list.append(p) 
+
+            # simplify the pitch list (for notes with 2+ accidentals)
+            simplified_notes = [str(p.simplifyEnharmonic(mostCommon=True)) for p in pitch_list]
+            es = analysis.enharmonics.EnharmonicSimplifier(simplified_notes)
+            notes= es.bestPitches()
+
+    # precomputed table answers common spellings without building a Chord
+    c = None
+    chord_name = lookup_chord_name(notes)
+    if chord_name is None:
+        c = chord.Chord(notes)
+        chord_name = c.pitchedCommonName
     
     # music21 always gets scales wrong for some reason
     if re.search(r'\bscale\b', chord_name, re.IGNORECASE):
@@ -45,48 +149,71 @@ def get_chord_name(note_set, key_name=None, simplify_numeral=True, simplify_chor
     
     # if key, call function to calculate chord relationship
     if key_name:
+        if c is None:
+            c = chord.Chord(notes)
         chord_relation = get_chord_relationship(c, key_name, simplify_numeral)
         return chord_name, chord_relation
     else:
         return chord_name, None
 
+@traced()
 def get_chord_relationship(chord_obj, key_name, simplify_numeral):
-    
-    try:
-        key_obj = key.Key(key_name)
-    except Exception as e:
+    info = key_info(key_name)
+    if info is None:
         return "Invalid key"
     
-    # extract first letter from key_name and make it uppercase
-    match = re.search(r'(\w)', key_name)
-    if match:
-        key_name_uppercase = match.group(1).upper()
-    else:
-        key_name_uppercase = None
+    key_name_uppercase = info.letter
+    key_type = info.mode
     
-
-    # key pitches as Pitch objects, normalize to be comparable
-    diatonic_pitch_classes = {p.pitchClass for p in key_obj.getPitches()}
-    chord_pitch_classes = {p.pitchClass for p in chord_obj.pitches}   
-    isDiatonic = chord_pitch_classes.issubset(diatonic_pitch_classes)
+    # diatonic membership is a bitmask test against the key's pitch classes
+    isDiatonic = is_diatonic(chord_obj, info)
     
     try:
-        # make sure to use major key's roman numeral due to bug calculating a major or minor key's iii and III chord
-        major_key_obj = key.Key(key_obj.tonic.name)
-        
-        roman_numeral = roman.romanNumeralFromChord(chord_obj, major_key_obj).figure
-        if simplify_numeral:
-            # extract the Roman numeral and sharps/flats at the beginning
-            numeral_match = re.match(r'^[#b\-]*[ivIV]+', roman_numeral)
-            if numeral_match:
-                simplified_numeral = numeral_match.group()
-                roman_numeral = simplified_numeral
-        
-        key_type = "minor" if key_obj.mode == "minor" else "major"
+        roman_numeral = simplified_numeral(chord_obj, info) if simplify_numeral else None
+        if roman_numeral is None:
+            roman_numeral = music21_roman_numeral(chord_obj, key_name, simplify_numeral)
         
         if isDiatonic:
             return f"This chord is the {roman_numeral} chord in the key of {key_name_uppercase}\nThis chord is diatonic to the key of {key_name_uppercase} {key_type}"
         else:
             return f"This chord is the {roman_numeral} chord in the key of {key_name_uppercase}\nThis chord is not diatonic to the key of {key_name_uppercase} {key_type}"
     except Exception as e:
-        return f"Error calculating chord relationship: {e}"
\ No newline at end of file
+        return f"Error calculating chord relationship: {e}"
+
+# numerals for a whole table of extracted chords in one key, '' where there's no answer
+# spellings are taken as written, repeated note sets are only analysed once
+def get_roman_numerals(note_sets, key_name, simplify_numeral=True):
+    info = key_info(key_name) if key_name else None
+    if info is None:
+        return ['' for _ in note_sets]
+
+    numerals = {}
+    results = []
+    for note_set in note_sets:
+        notes = tuple(note_set)
+        if notes not in numerals:
+            try:
+                c = chord.Chord(list(notes))
+                numeral = simplified_numeral(c, info) if simplify_numeral else None
+                if numeral is None:
+                    numeral = music21_roman_numeral(c, key_name, simplify_numeral)
+            except Exception:
+                numeral = ''
+            numerals[notes] = numeral
+        results.append(numerals[notes])
+    return results
+
+# full figures and the cases the numeral table leaves alone (augmented sixths, microtonal roots)
+def music21_roman_numeral(chord_obj, key_name, simplify_numeral):
+    key_obj = key.Key(key_name)
+    
+    # make sure to use major key's roman numeral due to bug calculating a major or minor key's iii and III chord
+    major_key_obj = key.Key(key_obj.tonic.name)
+    
+    roman_numeral = roman.romanNumeralFromChord(chord_obj, major_key_obj).figure
+    if simplify_numeral:
+        # extract the Roman numeral and sharps/flats at the beginning
+        numeral_match = re.match(r'^[#b\-]*[ivIV]+', roman_numeral)
+        if numeral_match:
+            roman_numeral = numeral_match.group()
+    return roman_numeral
@@ -0,0 +1,97 @@
+from bisect import bisect_right
+import numpy as np
+from music21 import harmony
+from backend.sonorities import measure_starts
+from backend.tracing import traced, span
+
+# a key for every measure of a score, read from the pitch content of the measures around it
+# every note's duration is added to a (measures x 12) pitch-class matrix in one pass over the score,
+# the window histograms are differences of its running sum and all of them are correlated against the
+# 24 Krumhansl-Kessler key profiles in a single matrix product, no music21 key analysis per window
+
+KEY_WINDOW = 4  # measures, centred on the measure being labelled
+
+MAJOR_PROFILE = np.array([6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88])
+MINOR_PROFILE = np.array([6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17])
+
+# tonic spellings by pitch class, in music21 key notation (upper case major, lower case minor)
+MAJOR_TONICS = ('C', 'D-', 'D', 'E-', 'E', 'F', 'F#', 'G', 'A-', 'A', 'B-', 'B')
+MINOR_TONICS = ('c', 'c#', 'd', 'e-', 'e', 'f', 'f#', 'g', 'g#', 'a', 'b-', 'b')
+KEY_NAMES = MAJOR_TONICS + MINOR_TONICS
+
+def standardize(rows):
+    rows = rows - rows.mean(axis=-1, keepdims=True)
+    norms = np.linalg.norm(rows, axis=-1, keepdims=True)
+    return np.divide(rows, norms, out=np.zeros_like(rows), where=norms > 0)
+
+# rows line up with KEY_NAMES, centred and scaled so a dot product is a correlation
+def key_profiles():
+    rotated = [np.roll(MAJOR_PROFILE, tonic) for tonic in range(12)]
+    rotated += [np.roll(MINOR_PROFILE, tonic) for tonic in range(12)]
+    return standardize(np.array(rotated))
+
+PROFILES = key_profiles()
+
+# quarter lengths of each pitch class sounding in each measure, notes tied over a barline are split
+def pitch_class_matrix(parts):
+    starts, numbers = measure_starts(parts)
+    matrix = np.zeros((len(starts), 12))
+
+    for part in parts:
+        for element in part.flatten().notes:
+            if isinstance(element, harmony.Harmony):
+                continue
+            length = float(element.quarterLength)
+            if length == 0:
+                continue
+            start = float(element.offset)
+            end = start + length
+            first = max(0, bisect_right(starts, start) - 1)
+
+            for p in element.pitches:
+                pitch_class = p.pitchClass
+                measure = first
+                position = start
+                # nearly every note stays inside its measure, only ties across barlines loop
+                while position < end:
+                    measure_end = starts[measure + 1] if measure + 1 < len(starts) else end
+                    stop = min(end, measure_end)
+                    matrix[measure, pitch_class] += stop - position
+                    position = stop
+                    measure += 1
+    return numbers, matrix
+
+# the sum of `window` consecutive rows around every row, from the running sum of the matrix
+def window_histograms(matrix, window=KEY_WINDOW):
+    window = max(1, int(window))
+    totals = np.vstack([np.zeros((1, matrix.shape[1])), np.cumsum(matrix, axis=0)])
+    rows = np.arange(len(matrix))
+    lower = np.clip(rows - (window - 1) // 2, 0, len(matrix))
+    upper = np.clip(rows + window // 2 + 1, 0, len(matrix))
+    return totals[upper] - totals[lower]
+
+# best key for every histogram, None where nothing sounds
+def best_keys(histograms):
+    correlations = standardize(histograms) @ PROFILES.T
+    best = correlations.argmax(axis=1)
+    silent = histograms.sum(axis=1) == 0
+    return [None if is_silent else KEY_NAMES[index] for index, is_silent in zip(best, silent)]
+
+# measure number -> key name, parts are the ones get_score_parts returns
+@traced()
+def detect_measure_keys(parts, window=KEY_WINDOW):
+    with span('pitch_class_matrix'):
+        numbers, matrix = pitch_class_matrix(parts)
+    return matrix_keys(numbers, matrix, window)
+
+# measure number -> key name from a pitch-class matrix, whatever it was read from
+def matrix_keys(numbers, matrix, window=KEY_WINDOW):
+    if not len(matrix):
+        return {}
+    keys = best_keys(window_histograms(matrix, window))
+
+    measure_keys = {}
+    for number, key_name in zip(numbers, keys):
+        if key_name is not None:
+            measure_keys.setdefault(number, key_name)
+    return measure_keys
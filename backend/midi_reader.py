@@ -0,0 +1,314 @@
+import os
+import struct
+from fractions import Fraction
+
+# chords straight from a Standard MIDI File, without music21's MIDI translation
+# each track is read as a stream of note-on/note-off events, notes struck within onset_tolerance quarter notes of
+# the first note of a group form one chord, and ticks become measure/offset through the time signature meta events
+# rows come out like the MusicXML extractor's, (part, measure, offset, None, notes), and are named the same way
+
+MIDI_EXTENSIONS = ('.mid', '.midi')
+ONSET_TOLERANCE = Fraction(1, 16)  # quarter notes, a 64th note, enough for humanised or strummed performances
+QUANTIZE_DIVISORS = (4, 3)  # onsets snap to sixteenths or eighth-note triplets, like music21's MIDI import
+PERCUSSION_CHANNEL = 9  # channel 10, drum notes aren't pitches
+
+# music21's spellings for pitch classes, and the ones used in keys with sharps or flats
+DEFAULT_NAMES = ('C', 'C#', 'D', 'E-', 'E', 'F', 'F#', 'G', 'G#', 'A', 'B-', 'B')
+SHARP_NAMES = ('C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B')
+FLAT_NAMES = ('C', 'D-', 'D', 'E-', 'E', 'F', 'G-', 'G', 'A-', 'A', 'B-', 'B')
+
+# data bytes after the status byte, by the status byte's high nibble
+CHANNEL_DATA_LENGTHS = {0x80: 2, 0x90: 2, 0xA0: 2, 0xB0: 2, 0xC0: 1, 0xD0: 1, 0xE0: 2}
+
+def is_midi_file(path):
+    return os.path.splitext(path)[1].lower() in MIDI_EXTENSIONS
+
+def read_variable_length(data, position):
+    value = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            return value, position
+
+# (tick, kind, values) for every event of one track chunk, in order
+#   ('note_on', (channel, key, velocity)), velocity 0 already turned into a note_off
+#   ('note_off', (channel, key))
+#   ('program', (channel, program))
+#   ('meta', (type, bytes))
+def iter_track_events(data):
+    position = 0
+    tick = 0
+    status = None
+    while position < len(data):
+        delta, position = read_variable_length(data, position)
+        tick += delta
+
+        byte = data[position]
+        if byte == 0xFF:
+            meta_type = data[position + 1]
+            length, position = read_variable_length(data, position + 2)
+            yield tick, 'meta', (meta_type, data[position:position + length])
+            position += length
+            if meta_type == 0x2F:
+                return  # end of track
+            continue
+        if byte in (0xF0, 0xF7):
+            length, position = read_variable_length(data, position + 1)
+            position += length  # system exclusive, nothing here for chords
+            continue
+
+        # running status, a data byte reuses the previous status
+        if byte & 0x80:
+            status = byte
+            position += 1
+        elif status is None:
+            raise ValueError("MIDI data byte without a status byte")
+        kind = status & 0xF0
+        channel = status & 0x0F
+        length = CHANNEL_DATA_LENGTHS.get(kind)
+        if length is None:
+            raise ValueError(f"Unknown MIDI status byte {status:#x}")
+        values = data[position:position + length]
+        position += length
+
+        if kind == 0x90 and values[1] > 0:
+            yield tick, 'note_on', (channel, values[0], values[1])
+        elif kind in (0x80, 0x90):
+            yield tick, 'note_off', (channel, values[0])
+        elif kind == 0xC0:
+            yield tick, 'program', (channel, values[0])
+
+# (format, ticks per quarter note, [track data]) of a whole file
+def read_chunks(midi_path):
+    with open(midi_path, 'rb') as f:
+        data = f.read()
+    if data[:4] != b'MThd':
+        raise ValueError(f"{midi_path} is not a Standard MIDI File")
+
+    header_length = struct.unpack('>I', data[4:8])[0]
+    file_format, track_count, division = struct.unpack('>HHH', data[8:14])
+    if division & 0x8000:
+        raise ValueError("MIDI files timed in SMPTE frames aren't supported")
+
+    tracks = []
+    position = 8 + header_length
+    while position + 8 <= len(data) and len(tracks) < track_count:
+        chunk_type = data[position:position + 4]
+        length = struct.unpack('>I', data[position + 4:position + 8])[0]
+        if chunk_type == b'MTrk':
+            tracks.append(data[position + 8:position + 8 + length])
+        position += 8 + length  # unknown chunk types are skipped, as the standard asks
+    return file_format, division, tracks
+
+class MidiTrack:
+    def __init__(self, index):
+        self.index = index
+        self.name = None
+        self.programs = {}  # channel -> first program
+        self.notes = []  # (start tick, end tick, channel, key)
+
+class MidiScore:
+    def __init__(self, midi_path):
+        self.path = midi_path
+        self.file_format, self.division, chunks = read_chunks(midi_path)
+        self.time_signatures = []  # (tick, numerator, denominator)
+        self.key_signatures = []  # (tick, sharps, negative for flats)
+        self.tracks = [self.read_track(i, chunk) for i, chunk in enumerate(chunks)]
+
+        # a file without a time signature is in 4/4
+        self.time_signatures.sort()
+        if not self.time_signatures or self.time_signatures[0][0] > 0:
+            self.time_signatures.insert(0, (0, 4, 4))
+        self.key_signatures.sort()
+        self.measure_starts = self.build_measure_starts()
+
+    def read_track(self, index, chunk):
+        track = MidiTrack(index)
+        sounding = {}  # (channel, key) -> start ticks of notes still held, a repeated key ends the oldest
+        tick = 0
+        try:
+            for tick, kind, values in iter_track_events(chunk):
+                self.read_event(track, sounding, tick, kind, values)
+        except IndexError:
+            raise ValueError(f"Track {index + 1} of {self.path} is cut short")
+
+        # notes never released end with the track
+        end = tick
+        for (channel, key), starts in sounding.items():
+            track.notes.extend((start, end, channel, key) for start in starts)
+        track.notes.sort()
+        return track
+
+    def read_event(self, track, sounding, tick, kind, values):
+        if kind == 'note_on':
+            channel, key, _ = values
+            sounding.setdefault((channel, key), []).append(tick)
+        elif kind == 'note_off':
+            starts = sounding.get(values)
+            if starts:
+                track.notes.append((starts.pop(0), tick, values[0], values[1]))
+        elif kind == 'program':
+            track.programs.setdefault(values[0], values[1])
+        else:
+            meta_type, payload = values
+            if meta_type == 0x03 and track.name is None:
+                track.name = payload.decode('latin-1').strip() or None
+            elif meta_type == 0x58 and len(payload) >= 2:
+                self.time_signatures.append((tick, payload[0], 2 ** payload[1]))
+            elif meta_type == 0x59 and len(payload) >= 1:
+                self.key_signatures.append((tick, payload[0] - 256 if payload[0] > 127 else payload[0]))
+
+    # (start tick, measure number, measure length in ticks) for every time signature, a change that falls
+    # inside a measure starts a new one
+    def build_measure_starts(self):
+        starts = []
+        tick, number = 0, 1
+        for i, (change, numerator, denominator) in enumerate(self.time_signatures):
+            if starts:
+                previous_tick, previous_number, previous_length = starts[-1]
+                elapsed = change - previous_tick
+                number = previous_number + -(-elapsed // previous_length)
+                tick = change
+            length = numerator * self.division * 4 // denominator
+            if i + 1 < len(self.time_signatures) and self.time_signatures[i + 1][0] == change:
+                continue  # replaced at the same tick
+            starts.append((tick, number, max(1, length)))
+        return starts
+
+    def segment(self, tick):
+        segment = self.measure_starts[0]
+        for candidate in self.measure_starts:
+            if candidate[0] > tick:
+                break
+            segment = candidate
+        return segment
+
+    # (measure number, offset in quarter notes from the start of the measure)
+    # quantize=True snaps the tick to the grid music21 quantizes MIDI to first, a humanised onset just before a
+    # barline lands on the next measure's downbeat
+    def measure_position(self, tick, quantize=False):
+        start, number, length = self.segment(tick)
+        if quantize:
+            tick = start + quantize_ticks(tick - start, self.division)
+            start, number, length = self.segment(tick)
+        measures, remainder = divmod(tick - start, length)
+        return number + int(measures), quarter_offset(Fraction(remainder, self.division))
+
+    def spelling(self, tick):
+        sharps = 0
+        for change, count in self.key_signatures:
+            if change > tick:
+                break
+            sharps = count
+        return SHARP_NAMES if sharps > 0 else FLAT_NAMES if sharps < 0 else DEFAULT_NAMES
+
+    # (label, track, channel) for every track and channel holding pitched notes, labels are unique
+    def parts(self):
+        channels = []
+        for track in self.tracks:
+            track_channels = sorted({channel for _, _, channel, _ in track.notes if channel != PERCUSSION_CHANNEL})
+            for channel in track_channels:
+                label = track.name or instrument_name(track.programs.get(channel)) or f"Track {track.index + 1}"
+                if len(track_channels) > 1:
+                    label = f"{label} (Channel {channel + 1})"
+                channels.append((label, track, channel))
+
+        counts = {}
+        for label, _, _ in channels:
+            counts[label] = counts.get(label, 0) + 1
+        return [(f"{label} (Track {track.index + 1})" if counts[label] > 1 else label, track, channel)
+                for label, track, channel in channels]
+
+def instrument_name(program):
+    if program is None:
+        return None
+    try:
+        from music21 import instrument
+        return instrument.instrumentFromMidiProgram(program).instrumentName
+    except Exception:
+        return None
+
+# ticks snapped to the nearest sixteenth or eighth-note triplet, whichever is closer (the first on a tie),
+# music21's default quarterLengthDivisors
+def quantize_ticks(ticks, division):
+    quarters = Fraction(ticks, division)
+    snapped = min((Fraction(round(quarters * divisor), divisor) for divisor in QUANTIZE_DIVISORS),
+                  key=lambda value: abs(value - quarters))
+    return snapped * division
+
+# offsets read back the way music21 keeps them, floats unless that would round them (triplets)
+def quarter_offset(value):
+    denominator = value.denominator
+    if denominator & (denominator - 1) == 0:
+        return float(value)
+    return value
+
+def note_name(key, names):
+    return f"{names[key % 12]}{key // 12 - 1}"
+
+# notes of one part grouped into chords, a group starts at its first note and takes every note struck within
+# the tolerance after it, groups with fewer than two distinct pitches are single notes and are left out
+def group_chords(notes, tolerance_ticks):
+    group = []
+    for note in notes:
+        if group and note[0] - group[0][0] > tolerance_ticks:
+            if len({n[3] for n in group}) > 1:
+                yield group
+            group = []
+        group.append(note)
+    if len({n[3] for n in group}) > 1:
+        yield group
+
+# rows for every part, in part order and time order within a part
+def iter_midi_parts(midi_path, onset_tolerance=None):
+    score = MidiScore(midi_path)
+    tolerance = Fraction(ONSET_TOLERANCE if onset_tolerance is None else onset_tolerance)
+    tolerance_ticks = tolerance * score.division
+
+    for label, track, channel in score.parts():
+        notes = [n for n in track.notes if n[2] == channel and n[1] > n[0]]
+        rows = []
+        for group in group_chords(notes, tolerance_ticks):
+            onset = group[0][0]
+            measure_number, offset = score.measure_position(onset, quantize=True)
+            names = score.spelling(onset)
+            keys = sorted({n[3] for n in group})
+            rows.append((label, measure_number, offset, None, ", ".join(note_name(key, names) for key in keys)))
+        yield label, rows
+
+def read_midi_chords(midi_path, onset_tolerance=None):
+    return [row for _, rows in iter_midi_parts(midi_path, onset_tolerance) for row in rows]
+
+# measure numbers and a (measures x 12) matrix of quarter notes each pitch class sounds in each measure,
+# the same matrix key detection builds from a music21 score
+def pitch_class_matrix(midi_path):
+    import numpy as np
+    score = MidiScore(midi_path)
+    notes = [n for track in score.tracks for n in track.notes if n[2] != PERCUSSION_CHANNEL and n[1] > n[0]]
+    if not notes:
+        return [], np.zeros((0, 12))
+
+    last_measure, _ = score.measure_position(max(end for _, end, _, _ in notes) - 1)
+    first_measure = score.measure_starts[0][1]
+    numbers = list(range(first_measure, last_measure + 1))
+    matrix = np.zeros((len(numbers), 12))
+
+    # ticks where each measure starts, so a note held over a barline is split between measures
+    boundaries = []
+    for i, (start, number, length) in enumerate(score.measure_starts):
+        stop_number = score.measure_starts[i + 1][1] if i + 1 < len(score.measure_starts) else last_measure + 1
+        boundaries.extend(start + (n - number) * length for n in range(number, stop_number))
+    boundaries.append(float('inf'))
+
+    from bisect import bisect_right
+    for start, end, _, key in notes:
+        measure = bisect_right(boundaries, start) - 1
+        position = start
+        while position < end:
+            stop = min(end, boundaries[measure + 1])
+            matrix[measure, key % 12] += (stop - position) / score.division
+            position = stop
+            measure += 1
+    return numbers, matrix
@@ -0,0 +1,275 @@
+import argparse
+import gzip
+import json
+import os
+import sys
+from music21 import chord, pitch, analysis, __version__ as music21_version
+
+# precomputed names for every pitch-class set, used as a fast path ahead of chord.Chord(...).pitchedCommonName
+# python -m backend.pcset_table build     regenerates the table (slow, runs music21 on every set)
+# python -m backend.pcset_table verify    re-checks the shipped table against music21
+
+STEPS = 'CDEFGAB'
+ROOT_NAMED = 0  # "<root>-<common name>"
+BASS_NAMED = 1  # "<common name> above <bass>"
+
+if hasattr(sys, '_MEIPASS'):
+    TABLE_PATH = os.path.join(sys._MEIPASS, 'backend', 'data', 'pcset_table.json.gz')
+else:
+    TABLE_PATH = os.path.join(os.path.dirname(__file__), 'data', 'pcset_table.json.gz')
+
+_table = None
+_loaded = False
+
+def load_table(path=TABLE_PATH):
+    global _table, _loaded
+    _loaded = True
+    _table = None
+
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Chord lookup table unavailable: {e}")
+        return None
+
+    # names were generated by a specific music21 version, anything else falls back to music21
+    if data.get('music21') != music21_version:
+        return None
+
+    names = data['names']
+    table = {}
+    for mask, name_id, kind, root_pc, letters, exceptions in data['entries']:
+        by_bass = {}
+        for bass_pc, rule in exceptions.items():
+            by_bass[int(bass_pc)] = (names[rule[0]], rule[1], rule[2]) if rule else None
+        table[mask] = ((names[name_id], kind, root_pc), letters, by_bass)
+
+    _table = table
+    return _table
+
+def get_table():
+    if not _loaded:
+        load_table()
+    return _table
+
+def pitch_class_mask(pitches):
+    mask = 0
+    for p in pitches:
+        mask |= 1 << p.pitchClass
+    return mask
+
+# returns the pitched common name, or None when the table cannot resolve this spelling
+def lookup_chord_name(pitches):
+    table = get_table()
+    if not table or not pitches:
+        return None
+
+    # microtones never reach the table
+    if any(p.alter != int(p.alter) for p in pitches):
+        return None
+
+    entry = table.get(pitch_class_mask(pitches))
+    if entry is None:
+        return None
+    return resolve_name(entry, pitches)
+
+def resolve_name(entry, pitches):
+    rule, letters, by_bass = entry
+
+    # the spelling has to match the generated one up to a consistent letter shift (C-E-G, B#-D##-F##, ...)
+    shift = None
+    spelled = {}
+    for p in pitches:
+        pc = p.pitchClass
+        offset = (STEPS.index(p.step) - STEPS.index(letters[pc])) % 7
+        if shift is None:
+            shift = offset
+        elif offset != shift:
+            return None
+        spelled[pc] = p
+
+    bass = min(pitches, key=lambda p: p.ps)
+    if bass.pitchClass in by_bass:
+        rule = by_bass[bass.pitchClass]
+        if rule is None:
+            return None
+
+    name, kind, root_pc = rule
+    if kind == BASS_NAMED:
+        return f"{name} above {bass.name.replace('-', 'b')}"
+    return f"{spelled[root_pc].name.replace('-', 'b')}-{name}"
+
+def canonical_spelling(mask):
+    names = [pitch.Pitch(pc).name for pc in range(12) if mask >> pc & 1]
+
+    # same simplification get_chord_name applies, so the common case matches the table spelling
+    simplified = [str(pitch.Pitch(n).simplifyEnharmonic(mostCommon=True)) for n in names]
+    return [p.name for p in analysis.enharmonics.EnharmonicSimplifier(simplified).bestPitches()]
+
+def voice(names, bass_name, octave_doublings=False, spread=False):
+    bass = pitch.Pitch(bass_name)
+    bass.octave = 3
+    voicing = [bass]
+
+    for i, n in enumerate(n for n in names if n != bass_name):
+        p = pitch.Pitch(n)
+        p.octave = 5 if spread and i % 2 else 4
+        while p.ps <= bass.ps:
+            p.octave += 1
+        voicing.append(p)
+
+    if octave_doublings:
+        top = pitch.Pitch(voicing[-1].name)
+        top.octave = voicing[-1].octave + 1
+        low = pitch.Pitch(bass_name)
+        low.octave = 2
+        voicing = [low] + voicing + [top]
+    return voicing
+
+# music21 picks roots of ambiguous sets by spacing and input order, so every entry is checked against several
+def voicings(names, bass_name):
+    for octave_doublings, spread in ((False, False), (True, False), (False, True)):
+        pitches = voice(names, bass_name, octave_doublings, spread)
+        yield pitches
+        yield pitches[::-1]
+
+def respell(names, shift):
+    respelled = []
+    for n in names:
+        p = pitch.Pitch(n)
+        step = STEPS[(STEPS.index(p.step) + shift) % 7]
+        target = pitch.Pitch(step)
+        alter = (p.pitchClass - target.pitchClass + 6) % 12 - 6
+        if abs(alter) > 2:
+            return None
+        target.accidental = pitch.Accidental(alter) if alter else None
+        respelled.append(target.name)
+    return respelled
+
+def describe(pitches):
+    c = chord.Chord(pitches)
+    name = c.pitchedCommonName
+    common_name = c.commonName
+
+    if name == f'{common_name} above {c.bass().name.replace("-", "b")}':
+        return name, (common_name, BASS_NAMED, None)
+    try:
+        root = c.root()
+    except Exception:
+        return name, None
+    if name == f'{root.name.replace("-", "b")}-{common_name}':
+        return name, (common_name, ROOT_NAMED, root.pitchClass)
+    return name, None
+
+def build_entry(mask):
+    names = canonical_spelling(mask)
+    letters = ['.'] * 12
+    for n in names:
+        letters[pitch.Pitch(n).pitchClass] = pitch.Pitch(n).step
+
+    rules = {}
+    for bass_name in names:
+        bass_pc = pitch.Pitch(bass_name).pitchClass
+        _, rule = describe(voice(names, bass_name))
+        rules[bass_pc] = rule
+
+    # most frequent rule becomes the default, every other bass gets an exception
+    candidates = [r for r in rules.values() if r is not None]
+    if not candidates:
+        return None
+    default = max(candidates, key=candidates.count)
+    exceptions = {pc: rule for pc, rule in rules.items() if rule != default}
+    entry = (default, ''.join(letters), exceptions)
+
+    # keep only the basses whose voicings and respellings all agree with music21
+    for bass_name in names:
+        bass_pc = pitch.Pitch(bass_name).pitchClass
+        if not check_bass(entry, names, bass_name):
+            exceptions[bass_pc] = None
+    return entry
+
+def check_bass(entry, names, bass_name):
+    variants = [names, respell(names, 1), respell(names, -1)]
+    for variant in variants:
+        if variant is None:
+            continue
+        bass_variant = variant[names.index(bass_name)]
+        for pitches in voicings(variant, bass_variant):
+            if resolve_name(entry, pitches) != chord.Chord(pitches).pitchedCommonName:
+                return False
+    return True
+
+def build_table(path=TABLE_PATH):
+    names = []
+    name_ids = {}
+
+    def name_id(name):
+        if name not in name_ids:
+            name_ids[name] = len(names)
+            names.append(name)
+        return name_ids[name]
+
+    entries = []
+    # one- and two-pitch-class sets depend on octave spacing, music21 always names those
+    for mask in range(1, 4096):
+        if bin(mask).count('1') < 3:
+            continue
+        entry = build_entry(mask)
+        if entry is None:
+            continue
+        (common_name, kind, root_pc), letters, exceptions = entry
+        encoded = {}
+        for bass_pc, rule in exceptions.items():
+            encoded[str(bass_pc)] = [name_id(rule[0]), rule[1], rule[2]] if rule else None
+        entries.append([mask, name_id(common_name), kind, root_pc, letters, encoded])
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        json.dump({'music21': music21_version, 'names': names, 'entries': entries}, f, separators=(',', ':'))
+    return len(entries)
+
+# exhaustive check: every set, every bass, several voicings and orderings, plus respellings
+def verify_table(path=TABLE_PATH):
+    table = load_table(path)
+    if table is None:
+        print("No table for this music21 version")
+        return 1
+
+    checked = resolved = mismatches = 0
+    for mask in range(1, 4096):
+        if bin(mask).count('1') < 3:
+            continue
+        names = canonical_spelling(mask)
+        for variant in (names, respell(names, 1), respell(names, -1)):
+            if variant is None:
+                continue
+            for bass_name in variant:
+                for pitches in voicings(variant, bass_name):
+                    expected = chord.Chord(pitches).pitchedCommonName
+                    actual = lookup_chord_name(pitches)
+                    checked += 1
+                    if actual is None:
+                        continue
+                    resolved += 1
+                    if actual != expected:
+                        mismatches += 1
+                        print(f"Mismatch for {[p.nameWithOctave for p in pitches]}: {actual!r} != {expected!r}")
+
+    print(f"Checked {checked} voicings, {resolved} answered by the table, {mismatches} mismatches")
+    return 1 if mismatches else 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m backend.pcset_table')
+    parser.add_argument('command', choices=['build', 'verify'])
+    parser.add_argument('--path', default=TABLE_PATH)
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        count = build_table(args.path)
+        print(f"Wrote {count} pitch-class sets to {args.path}")
+        return 0
+    return verify_table(args.path)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,270 @@
+import argparse
+import re
+import sys
+import numpy as np
+from backend.chord_store import ChordTable
+from backend.tracing import traced
+
+# finds every place a chord progression occurs in a loaded score, in any key
+# each part's chords, in measure/offset order with repeats merged, become tokens of (semitones from the previous
+# chord's root, chord quality), so the same progression gives the same tokens in every transposition
+# all parts' tokens share one suffix array: a pattern is found by binary search on its longest fully known run
+# of tokens, then only those candidates are checked against the rest of the pattern
+#   ii V7 I        roman numerals, upper case major and lower case minor, 7 / maj7 / o / o7 / h7 / + for other qualities
+#   I bVI          chromatic mediants, accidentals move the root
+#   ii* V* I*      a trailing * accepts any quality on that root
+#   I * V          * alone is any chord
+
+NAME_PATTERNS = (
+    re.compile(r'^(?P<root>[A-G][#b\-]*)-(?P<quality>.+)$'),  # C-major triad
+    re.compile(r'^(?P<quality>.+) above (?P<root>[A-G][#b\-]*)$'),  # Perfect Fifth above C
+)
+STEP_SEMITONES = {'C': 0, 'D': 2, 'E': 4, 'F': 5, 'G': 7, 'A': 9, 'B': 11}
+NO_ROOT = -1
+NO_INTERVAL = 12  # first chord of a part, or a chord next to one without a root
+INTERVALS = 13
+
+NUMERAL_PATTERN = re.compile(r'^(?P<accidentals>[#b]*)(?P<numeral>VII|VI|V|IV|III|II|I|vii|vi|v|iv|iii|ii|i)(?P<suffix>.*)$')
+NUMERAL_DEGREES = {'I': 0, 'II': 2, 'III': 4, 'IV': 5, 'V': 7, 'VI': 9, 'VII': 11}
+
+# numeral suffix -> quality, for upper and lower case numerals
+QUALITIES = {
+    ('', True): 'major triad',
+    ('', False): 'minor triad',
+    ('7', True): 'dominant seventh chord',
+    ('7', False): 'minor seventh chord',
+    ('maj7', True): 'major seventh chord',
+    ('o', False): 'diminished triad',
+    ('o7', False): 'diminished seventh chord',
+    ('h7', False): 'half-diminished seventh chord',
+    ('+', True): 'augmented triad',
+}
+
+def root_pitch_class(spelling):
+    alter = spelling.count('#') - spelling.count('b') - spelling.count('-')
+    return (STEP_SEMITONES[spelling[0]] + alter) % 12
+
+# (root pitch class, quality) from an extracted chord name, the bass stands in for the root of rootless names
+def chord_token(name):
+    for pattern in NAME_PATTERNS:
+        match = pattern.match(name)
+        if match:
+            return root_pitch_class(match.group('root')), match.group('quality')
+    return NO_ROOT, name
+
+# (degree or None, quality or None) per pattern chord, None is a wildcard
+def parse_pattern(pattern):
+    chords = []
+    for text in pattern.replace('-', ' ').replace('–', ' ').split():
+        if text == '*':
+            chords.append((None, None))
+            continue
+        match = NUMERAL_PATTERN.match(text)
+        if not match:
+            raise ValueError(f"can't read {text!r}, expected a roman numeral such as ii, V7 or bVI")
+        numeral = match.group('numeral')
+        accidentals = match.group('accidentals')
+        degree = (NUMERAL_DEGREES[numeral.upper()] + accidentals.count('#') - accidentals.count('b')) % 12
+
+        suffix = match.group('suffix')
+        if suffix == '*':
+            chords.append((degree, None))
+            continue
+        quality = QUALITIES.get((suffix.replace('°', 'o').replace('ø', 'h'), numeral.isupper()))
+        if quality is None:
+            raise ValueError(f"unknown chord quality in {text!r}")
+        chords.append((degree, quality))
+    if not chords:
+        raise ValueError("empty progression")
+    return chords
+
+# suffix array of an integer sequence by prefix doubling, each round is one sort of rank pairs
+def suffix_array(sequence):
+    count = len(sequence)
+    rank = np.unique(np.asarray(sequence, dtype=np.int64), return_inverse=True)[1].astype(np.int64)
+    order = np.argsort(rank, kind='stable')
+    step = 1
+    while step < count and rank[order[-1]] < count - 1:
+        following = np.full(count, -1, dtype=np.int64)
+        following[:count - step] = rank[step:]
+        order = np.lexsort((following, rank))
+        differs = (np.diff(rank[order]) != 0) | (np.diff(following[order]) != 0)
+        rank = np.empty(count, dtype=np.int64)
+        rank[order] = np.concatenate(([0], np.cumsum(differs)))
+        step *= 2
+    return order
+
+class ProgressionIndex:
+    @traced('progression_index')
+    def __init__(self, rows):
+        table = rows if isinstance(rows, ChordTable) else ChordTable(rows)
+        self.table = table
+
+        # tokens are worked out once per distinct chord name
+        names = [chord_token(name) for name in table.chord_names.values]
+        self.qualities = {}
+        name_roots = [root for root, _ in names]
+        name_qualities = [self.qualities.setdefault(quality, len(self.qualities)) for _, quality in names]
+
+        by_part = {}
+        for i in range(len(table)):
+            by_part.setdefault(table.parts[i], []).append(i)
+
+        # every part's rows in score order, back to back, positions point into this with first/last ranks
+        self.ordered = []
+        self.first_ranks = []
+        self.last_ranks = []
+        roots = []
+        qualities = []
+        tokens = []
+        for separator, indices in enumerate(by_part.values()):
+            indices.sort(key=lambda i: (table.measures[i], table.offsets[i]))
+            previous = None
+            for i in indices:
+                rank = len(self.ordered)
+                self.ordered.append(i)
+                name_id = table.names[i]
+                root, quality = name_roots[name_id], name_qualities[name_id]
+                if (root, quality) == previous:
+                    self.last_ranks[-1] = rank  # repeated chord, the run grows
+                    continue
+
+                interval = NO_INTERVAL if previous is None or NO_ROOT in (root, previous[0]) else (root - previous[0]) % 12
+                tokens.append(quality * INTERVALS + interval)
+                roots.append(root)
+                qualities.append(quality)
+                self.first_ranks.append(rank)
+                self.last_ranks.append(rank)
+                previous = (root, quality)
+
+            # a distinct negative token ends every part, so no match runs from one part into the next
+            tokens.append(-1 - separator)
+            roots.append(NO_ROOT)
+            qualities.append(-1)
+            self.first_ranks.append(-1)
+            self.last_ranks.append(-1)
+
+        self.tokens = tokens
+        self.roots = roots
+        self.quality_ids = qualities
+        self.suffixes = suffix_array(tokens).tolist() if tokens else []
+
+    # the longest stretch of pattern positions whose tokens are fully known, as (first position, tokens)
+    def anchor(self, chords):
+        best_start, best = 0, ()
+        run_start, run = 0, ()
+        for j in range(1, len(chords)):
+            degree, quality = chords[j]
+            previous_degree = chords[j - 1][0]
+            if degree is None or previous_degree is None or quality is None:
+                run = ()
+                continue
+            if not run:
+                run_start = j
+            run += (self.qualities[quality] * INTERVALS + (degree - previous_degree) % 12,)
+            if len(run) > len(best):
+                best_start, best = run_start, run
+        return best_start, best
+
+    # positions where the run starts, two binary searches over the suffix array
+    def candidates(self, run):
+        tokens, suffixes = self.tokens, self.suffixes
+        length = len(run)
+
+        def prefix(position):
+            return tuple(tokens[position:position + length])
+
+        low, high = 0, len(suffixes)
+        while low < high:
+            middle = (low + high) // 2
+            if prefix(suffixes[middle]) < run:
+                low = middle + 1
+            else:
+                high = middle
+        start, high = low, len(suffixes)
+        while low < high:
+            middle = (low + high) // 2
+            if prefix(suffixes[middle]) <= run:
+                low = middle + 1
+            else:
+                high = middle
+        return suffixes[start:low]
+
+    def matches_at(self, chords, start):
+        if start < 0 or start + len(chords) > len(self.tokens):
+            return False
+        reference = None
+        for j, (degree, quality) in enumerate(chords):
+            position = start + j
+            if self.first_ranks[position] < 0:
+                return False  # ran into the end of a part
+            if quality is not None and self.quality_ids[position] != self.qualities[quality]:
+                return False
+            if degree is not None:
+                root = self.roots[position]
+                if root == NO_ROOT:
+                    return False
+                # every root has to sit where the pattern puts it relative to the first known root
+                if reference is None:
+                    reference = (root - degree) % 12
+                elif (root - degree) % 12 != reference:
+                    return False
+        return True
+
+    # (first rank, last rank) into self.ordered for every match
+    def spans(self, chords):
+        # a quality that never occurs can't match anywhere
+        if any(quality is not None and quality not in self.qualities for _, quality in chords):
+            return []
+
+        offset, run = self.anchor(chords)
+        if run:
+            starts = sorted(position - offset for position in self.candidates(run))
+        else:
+            # nothing fixed to search on (a single chord, or wildcards around every chord), every position is checked
+            starts = range(len(self.tokens))
+
+        return [(self.first_ranks[start], self.last_ranks[start + len(chords) - 1])
+                for start in starts if self.matches_at(chords, start)]
+
+    # (first row, last row) indices into the ChordTable, in score order within each part
+    @traced('progression_search')
+    def search(self, pattern):
+        chords = parse_pattern(pattern) if isinstance(pattern, str) else pattern
+        return [(self.ordered[first], self.ordered[last]) for first, last in self.spans(chords)]
+
+    # every table row inside a match, repeated chords included
+    def matching_rows(self, pattern):
+        chords = parse_pattern(pattern) if isinstance(pattern, str) else pattern
+        rows = set()
+        for first, last in self.spans(chords):
+            rows.update(self.ordered[first:last + 1])
+        return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m backend.progression_index', description="Find a chord progression anywhere in a score, in any key")
+    parser.add_argument('score')
+    parser.add_argument('pattern', help='roman numerals such as "ii V7 I" or "I bVI", * for any chord')
+    parser.add_argument('--no-simplify', action='store_true', help="match music21's raw chord names")
+    args = parser.parse_args(argv)
+
+    from backend.chord_extractor import extract_score_chords
+    rows = extract_score_chords(args.score, not args.no_simplify)
+    if rows is None:
+        return 1
+
+    index = ProgressionIndex(rows)
+    try:
+        spans = index.search(args.pattern)
+    except ValueError as e:
+        parser.error(str(e))
+
+    table = index.table
+    for first, last in spans:
+        print(f"{table.part(first)}: measure {table.measure(first)} beat {table.offset(first)} "
+              f"to measure {table.measure(last)} beat {table.offset(last)}")
+    print(f"{len(spans)} matches", file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
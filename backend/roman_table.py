@@ -0,0 +1,86 @@
+import re
+from functools import lru_cache
+from music21 import key
+from backend.pcset_table import pitch_class_mask
+
+# key lookups for get_chord_relationship, so a chord's relationship to a key is a bitmask test plus a dict lookup
+# instead of building two Key objects and running roman.romanNumeralFromChord per chord
+# every key gets its diatonic pitch-class mask and, for each spelled root, the simplified numeral music21 would
+# give it (prefix + scale step, upper case for a major third, lower otherwise)
+# only the simplified numeral is table driven, full figures (inversions, augmented sixths) still go to music21
+
+STEPS = 'CDEFGAB'
+ROMAN = ('I', 'II', 'III', 'IV', 'V', 'VI', 'VII')
+ACCIDENTALS = {-2: '--', -1: '-', 0: '', 1: '#', 2: '##'}
+
+# the 15 major and 15 minor key signatures
+KEY_NAMES = (
+    'C', 'G', 'D', 'A', 'E', 'B', 'F#', 'C#', 'F', 'B-', 'E-', 'A-', 'D-', 'G-', 'C-',
+    'a', 'e', 'b', 'f#', 'c#', 'g#', 'd#', 'a#', 'd', 'g', 'c', 'f', 'b-', 'e-', 'a-',
+)
+
+# numerals whose full figure music21 may turn into It6/Fr43/Ger65/Sw7
+AUGMENTED_SIXTH_NUMERALS = ('#iv', 'II', '#ii')
+
+class KeyInfo:
+    def __init__(self, key_name, key_obj):
+        self.name = key_name
+        self.mode = "minor" if key_obj.mode == "minor" else "major"
+
+        # same first-letter rule the relationship text always used
+        match = re.search(r'(\w)', key_name)
+        self.letter = match.group(1).upper() if match else None
+
+        self.mask = pitch_class_mask(key_obj.getPitches())
+
+        # numerals are always read in the major key on the same tonic (music21 gets iii/III wrong in minor)
+        tonic = key_obj.tonic
+        major_scale = key.Key(tonic.name).getPitches()[:7]
+        scale_alters = {p.step: int(p.alter) for p in major_scale}
+        tonic_index = STEPS.index(tonic.step)
+
+        self.numerals = {}  # root name -> (numeral over a major third, numeral otherwise)
+        for step in STEPS:
+            degree = (STEPS.index(step) - tonic_index) % 7
+            for alter, accidental in ACCIDENTALS.items():
+                difference = alter - scale_alters[step]
+                if abs(difference) > 1:
+                    continue  # music21 can fail on doubly altered degrees, it keeps the final say there
+                prefix = '#' * difference if difference > 0 else 'b' * -difference
+                self.numerals[step + accidental] = (prefix + ROMAN[degree], prefix + ROMAN[degree].lower())
+
+# None for anything music21 can't read as a key
+# the names come from free text in the key boxes, so only the most recent ones are kept (the 30 keys fit)
+@lru_cache(maxsize=64)
+def key_info(key_name):
+    try:
+        return KeyInfo(key_name, key.Key(key_name))
+    except Exception:
+        return None
+
+def precompute():
+    for key_name in KEY_NAMES:
+        key_info(key_name)
+
+def is_diatonic(chord_obj, info):
+    return pitch_class_mask(chord_obj.pitches) & ~info.mask == 0
+
+# the simplified Roman numeral, or None when music21 has to decide
+def simplified_numeral(chord_obj, info):
+    if not chord_obj.pitches:
+        return None
+    # a double accidental anywhere in the chord can make music21 error out, keep its answer for those
+    if any(abs(p.alter) > 1 for p in chord_obj.pitches):
+        return None
+    root = chord_obj.root()
+    if root.microtone.cents or root.alter != int(root.alter):
+        return None
+
+    numerals = info.numerals.get(root.name)
+    if numerals is None:
+        return None
+    numeral = numerals[0] if chord_obj.semitonesFromChordStep(3) == 4 else numerals[1]
+
+    if numeral in AUGMENTED_SIXTH_NUMERALS and chord_obj.isAugmentedSixth(permitAnyInversion=True):
+        return None
+    return numeral
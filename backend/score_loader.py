@@ -0,0 +1,93 @@
+import queue
+import threading
+from backend.tracing import span
+
+# runs load_chord_batches on a worker thread so the window keeps drawing while music21 parses
+# the GUI polls `messages` from after() callbacks, Tk widgets are never touched from the worker
+#   ('rows', (progress, rows))  a finished part (or stream batch)
+#   ('names', names)            notes text -> simplified chord name, after the rows when they were extracted
+#                               without the simplifier and simplified_names is set, so the toggle has them ready
+#   ('keys', measure_keys)      measure number -> detected key, after the last rows when detect_keys is set
+#   ('done', None)              every batch was delivered
+#   ('error', message)          the score could not be read
+# a cancelled load stops at the next batch boundary and posts nothing more
+class ScoreLoader:
+    def __init__(self, score_path, simplify_chords=True, cache=None, engine='music21', sonorities=False, part_filter=None,
+                 detect_keys=False, key_window=None, jobs=None, simplified_names=False):
+        self.score_path = score_path
+        self.simplify_chords = simplify_chords
+        self.cache = cache
+        self.engine = engine
+        self.sonorities = sonorities
+        self.part_filter = part_filter
+        self.detect_keys = detect_keys
+        self.key_window = key_window
+        self.jobs = jobs  # worker processes for chord naming, None for every core
+        self.simplified_names = simplified_names and not simplify_chords
+        self.messages = queue.Queue()
+        self.cancelled = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def is_cancelled(self):
+        return self.cancelled.is_set()
+
+    def run(self):
+        # imported here so the GUI thread never waits on music21's import
+        from backend.chord_extractor import load_chord_batches, load_measure_keys, KEY_WINDOW
+
+        note_texts = {}
+        parsed = []  # the extraction's parts, key detection reads the same ones
+        try:
+            with span('load_score', path=self.score_path):
+                batches = load_chord_batches(self.score_path, self.simplify_chords, self.cache, self.engine, self.sonorities, self.part_filter, self.jobs,
+                                             on_parts=parsed.append if self.detect_keys else None)
+                for progress, rows in batches:
+                    if self.cancelled.is_set():
+                        return
+                    self.messages.put(('rows', (progress, rows)))
+                    if self.simplified_names:
+                        note_texts.update((row[4], None) for row in rows)
+        except Exception as e:
+            if not self.cancelled.is_set():
+                self.messages.put(('error', str(e)))
+            return
+
+        if note_texts and not self.cancelled.is_set():
+            try:
+                with span('simplified_names', path=self.score_path):
+                    self.messages.put(('names', self.name_simplified(list(note_texts))))
+            except Exception as e:
+                print(f"Naming chords failed: {e}")
+
+        # the rows are already on screen, a score without a usable key just gets no numerals
+        if self.detect_keys and not self.cancelled.is_set():
+            try:
+                with span('detect_keys', path=self.score_path):
+                    keys = load_measure_keys(self.score_path, self.key_window or KEY_WINDOW, self.cache, parsed[0] if parsed else None)
+                self.messages.put(('keys', keys))
+            except Exception as e:
+                print(f"Key detection failed: {e}")
+
+        if not self.cancelled.is_set():
+            self.messages.put(('done', None))
+
+    # every distinct sonority of the score named once, with the simplifier
+    def name_simplified(self, texts):
+        from backend.find_chord import get_chord_names
+        names = get_chord_names([text.split(", ") for text in texts], simplify_chords=True, jobs=self.jobs)
+        return {text: name for text, (name, _) in zip(texts, names)}
+
+    # everything posted since the last poll, without blocking the caller
+    def poll(self):
+        messages = []
+        while True:
+            try:
+                messages.append(self.messages.get_nowait())
+            except queue.Empty:
+                return messages
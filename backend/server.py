@@ -0,0 +1,323 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from backend.startup import worker_context
+from backend.tracing import SpanStats, tracer, run_traced, traced_result
+
+# headless chord analysis for other tools, a small HTTP/JSON server on localhost or a unix socket
+# python main.py --serve [--port 8765 | --unix /tmp/music_analyzer.sock] [-j 4]
+#   POST /chord         {"notes": ["C4", "E4", "G4"], "key": "C"}      -> {"chord": ..., "relationship": ...}
+#   POST /chords        {"note_sets": [[...], ...], "key": "C"}        -> {"results": [{"chord": ..., "relationship": ...}, ...]}
+#   POST /relationship  {"notes": [...], "key": "C"}                   -> {"relationship": ...}
+#   POST /extract       {"path": "score.musicxml", "sonorities": false} -> {"chords": [...], "error": null}
+#   GET  /metrics       request counts, latency percentiles, queue depth and batch sizes
+# optional fields: simplify_numeral and simplify_chords (default true), for /extract also engine and parts
+# music21 work runs in a process pool whose workers warm up once and stay alive between requests,
+# single /chord requests arriving within BATCH_WINDOW_MS of each other are named in one pool task
+
+DEFAULT_PORT = 8765
+BATCH_WINDOW_MS = 5
+MAX_BATCH = 256
+MAX_BODY = 16 * 1024 * 1024
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+class RequestError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+# pool side, everything below runs in the worker processes
+
+def warm_worker():
+    # stdout may be a pipe the caller reads, music21's chatter goes to stderr
+    sys.stdout = sys.stderr
+    from backend.startup import warm_up
+    warm_up()
+
+def name_chords(note_sets, key_name, simplify_numeral, simplify_chords):
+    from backend.find_chord import get_chord_names
+    return get_chord_names(note_sets, key_name, simplify_numeral, simplify_chords, jobs=1)
+
+def relate_chord(notes, key_name, simplify_numeral):
+    from backend.find_chord import get_chord_relationship
+    from music21 import chord
+    try:
+        chord_obj = chord.Chord(notes)
+    except Exception as e:
+        return f"{e}"
+    return get_chord_relationship(chord_obj, key_name, simplify_numeral)
+
+def extract_chords(path, simplify_chords, engine, sonorities, part_filter):
+    from backend.batch_extract import process_score
+    _, records, error, _ = process_score(path, simplify_chords, None, engine, sonorities, part_filter, jobs=1)
+    return records, error
+
+# server side
+
+def chord_result(result):
+    chord_name, relation = result
+    return {'chord': chord_name, 'relationship': relation}
+
+def note_list(value, field='notes'):
+    if isinstance(value, str):
+        value = [n.strip() for n in value.split(',')]
+    if not isinstance(value, list) or not all(isinstance(n, str) for n in value):
+        raise RequestError(400, f"'{field}' must be a list of note names")
+    return [n for n in value if n]
+
+def chord_options(body):
+    key_name = body.get('key') or None
+    if key_name is not None and not isinstance(key_name, str):
+        raise RequestError(400, "'key' must be a string")
+    return key_name, bool(body.get('simplify_numeral', True)), bool(body.get('simplify_chords', True))
+
+class ChordServer:
+    def __init__(self, jobs=None):
+        self.jobs = jobs or os.cpu_count() or 1
+        self.pool = None
+        self.started = time.time()
+        self.latency = {}  # route -> SpanStats
+        self.errors = 0
+        self.in_flight = 0  # pool tasks submitted and not finished
+        self.peak_in_flight = 0
+        self.batches = 0  # pool tasks naming chords, and the chords they named
+        self.batched_chords = 0
+        self.largest_batch = 0
+        self.pending = {}  # chord options -> [(notes, future)] waiting for the batch window
+        self.flush_jobs = {}
+
+    def start_pool(self):
+        self.pool = ProcessPoolExecutor(max_workers=self.jobs, initializer=warm_worker, mp_context=worker_context())
+        # every worker pays its music21 start-up now rather than on a client's first request
+        return [self.pool.submit(time.sleep, 0.1) for _ in range(self.jobs)]
+
+    def count_batch(self, size):
+        self.batches += 1
+        self.batched_chords += size
+        self.largest_batch = max(self.largest_batch, size)
+
+    async def run_in_pool(self, function, *args):
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            value = await asyncio.get_running_loop().run_in_executor(self.pool, run_traced, tracer.enabled, function, *args)
+            return traced_result(value)
+        finally:
+            self.in_flight -= 1
+
+    # single chords are held for a few milliseconds, so a burst of clients shares one pool task per option set
+    async def name_chord(self, notes, options):
+        future = asyncio.get_running_loop().create_future()
+        waiting = self.pending.setdefault(options, [])
+        waiting.append((notes, future))
+        if len(waiting) >= MAX_BATCH:
+            self.flush(options)
+        elif options not in self.flush_jobs:
+            self.flush_jobs[options] = asyncio.get_running_loop().call_later(BATCH_WINDOW_MS / 1000, self.flush, options)
+        return await future
+
+    def flush(self, options):
+        job = self.flush_jobs.pop(options, None)
+        if job is not None:
+            job.cancel()
+        waiting = self.pending.pop(options, [])
+        if waiting:
+            asyncio.ensure_future(self.name_batch(waiting, options))
+
+    async def name_batch(self, waiting, options):
+        self.count_batch(len(waiting))
+        try:
+            results = await self.run_in_pool(name_chords, [notes for notes, _ in waiting], *options)
+        except Exception as e:
+            for _, future in waiting:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(waiting, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def handle_chord(self, body):
+        notes = note_list(body.get('notes'))
+        return chord_result(await self.name_chord(notes, chord_options(body)))
+
+    async def handle_chords(self, body):
+        note_sets = body.get('note_sets')
+        if not isinstance(note_sets, list):
+            raise RequestError(400, "'note_sets' must be a list of note lists")
+        note_sets = [note_list(notes, 'note_sets') for notes in note_sets]
+        self.count_batch(len(note_sets))
+        results = await self.run_in_pool(name_chords, note_sets, *chord_options(body))
+        return {'results': [chord_result(result) for result in results]}
+
+    async def handle_relationship(self, body):
+        notes = note_list(body.get('notes'))
+        key_name, simplify_numeral, _ = chord_options(body)
+        if not notes or key_name is None:
+            raise RequestError(400, "'notes' and 'key' are required")
+        return {'relationship': await self.run_in_pool(relate_chord, notes, key_name, simplify_numeral)}
+
+    async def handle_extract(self, body):
+        path = body.get('path')
+        if not isinstance(path, str) or not os.path.isfile(path):
+            raise RequestError(400, "'path' must name a score file readable by the server")
+        engine = body.get('engine', 'music21')
+        if engine not in ('music21', 'stream'):
+            raise RequestError(400, "'engine' must be 'music21' or 'stream'")
+        sonorities = bool(body.get('sonorities', False))
+        parts = body.get('parts')
+        if parts is not None and (not sonorities or not isinstance(parts, list)):
+            raise RequestError(400, "'parts' must be a list and needs 'sonorities'")
+        if sonorities and engine != 'music21':
+            raise RequestError(400, "'sonorities' needs the music21 engine")
+
+        records, error = await self.run_in_pool(extract_chords, path, bool(body.get('simplify_chords', True)), engine, sonorities, parts)
+        return {'chords': records, 'error': error}
+
+    def handle_metrics(self):
+        routes = {}
+        for route, stats in self.latency.items():
+            routes[route] = {
+                'requests': stats.count,
+                'mean_ms': round(stats.total * 1000 / stats.count, 3),
+                'p50_ms': round(stats.percentile(0.5), 3),
+                'p95_ms': round(stats.percentile(0.95), 3),
+                'max_ms': round(stats.max * 1000, 3),
+            }
+        return {
+            'uptime_s': round(time.time() - self.started, 1),
+            'workers': self.jobs,
+            'routes': routes,
+            'errors': self.errors,
+            'queue_depth': self.in_flight,
+            'peak_queue_depth': self.peak_in_flight,
+            'waiting_for_batch': sum(len(waiting) for waiting in self.pending.values()),
+            'batches': self.batches,
+            'mean_batch_size': round(self.batched_chords / self.batches, 1) if self.batches else 0,
+            'largest_batch': self.largest_batch,
+        }
+
+    async def dispatch(self, method, route, body):
+        if route == '/metrics':
+            if method != 'GET':
+                raise RequestError(405, "use GET")
+            return self.handle_metrics()
+
+        handlers = {
+            '/chord': self.handle_chord,
+            '/chords': self.handle_chords,
+            '/relationship': self.handle_relationship,
+            '/extract': self.handle_extract,
+        }
+        handler = handlers.get(route)
+        if handler is None:
+            raise RequestError(404, f"no route {route}")
+        if method != 'POST':
+            raise RequestError(405, "use POST with a JSON body")
+        try:
+            body = json.loads(body or b'{}')
+        except ValueError as e:
+            raise RequestError(400, f"invalid JSON: {e}")
+        if not isinstance(body, dict):
+            raise RequestError(400, "the body must be a JSON object")
+        return await handler(body)
+
+    # one connection, HTTP/1.1 keep-alive until the client closes it
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                start = time.perf_counter()
+                keep_alive = True
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                    headers = {}
+                    while True:
+                        line = await reader.readline()
+                        if line in (b'\r\n', b'\n', b''):
+                            break
+                        name, _, value = line.decode('latin-1').partition(':')
+                        headers[name.strip().lower()] = value.strip()
+                    keep_alive = headers.get('connection', '').lower() != 'close' and version != 'HTTP/1.0'
+
+                    length = int(headers.get('content-length', 0))
+                    if length > MAX_BODY:
+                        keep_alive = False
+                        raise RequestError(413, "request body too large")
+                    body = await reader.readexactly(length) if length else b''
+                    route = target.split('?', 1)[0]
+                    status, payload = 200, await self.dispatch(method, route, body)
+                except RequestError as e:
+                    route = None
+                    status, payload = e.status, {'error': str(e)}
+                except ValueError:
+                    route, keep_alive = None, False
+                    status, payload = 400, {'error': "malformed request"}
+                except Exception as e:
+                    route = None
+                    status, payload = 500, {'error': f"{type(e).__name__}: {e}"}
+
+                if status != 200:
+                    self.errors += 1
+                elif route != '/metrics':
+                    self.latency.setdefault(route, SpanStats()).add(time.perf_counter() - start)
+
+                data = json.dumps(payload).encode('utf-8')
+                writer.write(
+                    f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=DEFAULT_PORT, unix_path=None):
+        warming = self.start_pool()
+        try:
+            if unix_path:
+                server = await asyncio.start_unix_server(self.handle_connection, path=unix_path)
+                where = unix_path
+            else:
+                server = await asyncio.start_server(self.handle_connection, host, port)
+                where = f"http://{host}:{server.sockets[0].getsockname()[1]}"
+
+            await asyncio.gather(*(asyncio.wrap_future(future) for future in warming))
+            print(f"Serving chord analysis on {where} with {self.jobs} workers", file=sys.stderr)
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.pool.shutdown(cancel_futures=True)
+            if unix_path and os.path.exists(unix_path):
+                os.remove(unix_path)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python main.py --serve', description="Serve chord naming and extraction over local HTTP/JSON")
+    parser.add_argument('--host', default='127.0.0.1', help="interface to listen on (default: localhost only)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="0 picks a free port")
+    parser.add_argument('--unix', metavar='PATH', help="listen on a unix socket instead of TCP")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help="music21 worker processes")
+    args = parser.parse_args(argv)
+
+    if args.unix and not hasattr(asyncio, 'start_unix_server'):
+        parser.error("unix sockets aren't available on this platform")
+
+    try:
+        asyncio.run(ChordServer(args.jobs).serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
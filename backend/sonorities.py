@@ -0,0 +1,95 @@
+from bisect import bisect_right
+from collections import Counter
+from music21 import common, harmony
+from backend.stream_extractor import pitched_common_name
+from backend.tracing import traced
+
+# vertical sonorities across parts: every note's onset and release goes into one sorted event list,
+# the sweep keeps the pitches sounding at each point in time and emits a row whenever that set changes
+# n log n for the sort, then linear in the events, unlike chordify this never splits or copies the score
+# held notes under moving voices and chords split between instruments both show up this way
+
+ONSET = 1
+RELEASE = 0  # sorts first, so a note ending exactly where another starts is already gone
+
+# case-insensitive substrings of part labels, same matching as the Part filter box
+def part_selected(label, part_filter):
+    if not part_filter:
+        return True
+    label = label.lower()
+    return any(text.lower() in label for text in part_filter)
+
+def note_events(part, part_index):
+    events = []
+    for element in part.flatten().notes:
+        # chord symbols are analysis, not sounding notes
+        if isinstance(element, harmony.Harmony):
+            continue
+        length = element.quarterLength
+        if length == 0:  # grace notes
+            continue
+        start = element.offset
+        for p in getattr(element, 'pitches', ()):
+            events.append((start, ONSET, part_index, p))
+            events.append((common.opFrac(start + length), RELEASE, part_index, p))
+    return events
+
+# (start offset, measure number) for looking up which measure a point in time falls in
+def measure_starts(parts):
+    for part in parts:
+        measures = list(part.getElementsByClass('Measure'))
+        if measures:
+            return [m.offset for m in measures], [m.number for m in measures]
+    return [0], [0]
+
+# parts are expected to carry their labels already (label_consecutive_parts)
+def iter_sonorities(parts, part_filter=None):
+    labels = [part.partName or "Unknown Part" for part in parts]
+
+    events = []
+    for part_index, part in enumerate(parts):
+        if part_selected(labels[part_index], part_filter):
+            events.extend(note_events(part, part_index))
+    events.sort(key=lambda event: (event[0], event[1]))
+
+    starts, numbers = measure_starts(parts)
+    sounding = Counter()  # (pitch name, part index) -> notes currently holding it
+    pitches = {}
+    previous = None
+
+    i = 0
+    while i < len(events):
+        time = events[i][0]
+
+        # apply everything that happens at this instant before looking at the result
+        while i < len(events) and events[i][0] == time:
+            _, kind, part_index, p = events[i]
+            key = (p.nameWithOctave, part_index)
+            if kind == ONSET:
+                sounding[key] += 1
+                pitches[p.nameWithOctave] = p
+            else:
+                sounding[key] -= 1
+                if sounding[key] <= 0:
+                    del sounding[key]
+            i += 1
+
+        names = {name for name, _ in sounding}
+        state = frozenset(names)
+        if state == previous:
+            continue
+        previous = state
+        if len(names) < 2:
+            continue
+
+        ordered = sorted(names, key=lambda name: pitches[name].ps)
+        part_indices = sorted({part_index for _, part_index in sounding})
+        part_label = ", ".join(dict.fromkeys(labels[j] for j in part_indices))
+
+        measure = max(0, bisect_right(starts, time) - 1)
+        offset = common.opFrac(time - starts[measure])
+        yield (part_label, numbers[measure], offset, pitched_common_name(ordered), ", ".join(ordered))
+
+@traced()
+def extract_sonorities(parts, part_filter=None):
+    return list(iter_sonorities(parts, part_filter))
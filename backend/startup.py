@@ -0,0 +1,106 @@
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from functools import lru_cache
+
+# startup is split so the window can show before music21 is usable:
+# the GUI only imports music21 inside the functions that need it, and warm_up() pays the one-time costs
+# (import, environment, chord table, first chord name) on a background thread right after the first frame
+# python main.py --startup-report (or MUSIC_ANALYZER_STARTUP_REPORT=1) prints where the time went
+
+class StartupTimer:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.marks = []
+        self.lock = threading.Lock()
+        self.enabled = bool(os.environ.get('MUSIC_ANALYZER_STARTUP_REPORT'))
+        self.reported = False
+
+    # seconds since the timer was created, per step and since the previous mark on the same thread
+    def mark(self, name):
+        now = time.perf_counter()
+        thread = threading.current_thread().name
+        with self.lock:
+            previous = max((t for _, t, th in self.marks if th == thread), default=self.start)
+            self.marks.append((name, now, thread))
+        return now - previous
+
+    def report(self, out=None):
+        out = out or sys.stderr
+        with self.lock:
+            marks = sorted(self.marks, key=lambda m: m[1])
+        print("Startup timing (seconds since launch, step duration):", file=out)
+        previous = {}
+        for name, t, thread in marks:
+            step = t - previous.get(thread, self.start)
+            previous[thread] = t
+            where = "" if thread == 'MainThread' else f" [{thread}]"
+            print(f"  {t - self.start:7.3f}s  {step:7.3f}s  {name}{where}", file=out)
+
+    # printed once, when both the first frame and the warm-up are done
+    def report_when_ready(self):
+        if not self.enabled:
+            return
+        with self.lock:
+            names = {name for name, _, _ in self.marks}
+            if self.reported or not {"first frame", "warm-up finished"} <= names:
+                return
+            self.reported = True
+        self.report()
+
+startup_timer = StartupTimer()
+
+def warm_up(chord_cache_path=None):
+    startup_timer.mark("warm-up started")
+
+    import music21
+    startup_timer.mark("music21 imported")
+
+    # reads (or creates) the user's music21 settings, the first converter.parse would do it otherwise
+    music21.environment.Environment()
+    startup_timer.mark("music21 environment")
+
+    from backend.find_chord import get_chord_name, chord_name_cache
+    import backend.chord_extractor
+    startup_timer.mark("chord engine imported")
+
+    if chord_cache_path:
+        chord_name_cache.open_store(chord_cache_path)
+        startup_timer.mark("chord cache opened")
+
+    from backend.pcset_table import get_table
+    get_table()
+    startup_timer.mark("chord table loaded")
+
+    # roman numerals and key objects have their own first-use costs
+    from backend.roman_table import precompute
+    precompute()
+    get_chord_name(['C4', 'E4', 'G4'], 'C')
+    startup_timer.mark("warm-up finished")
+
+def start_warm_up(chord_cache_path=None, on_done=None):
+    def run():
+        try:
+            warm_up(chord_cache_path)
+        except Exception as e:
+            print(f"Warm-up failed: {e}")
+        if on_done:
+            on_done()
+
+    thread = threading.Thread(target=run, name='warm-up', daemon=True)
+    thread.start()
+    return thread
+
+# worker pools never fork this process: a fork taken while other threads run (the window, the loader thread,
+# the server's event loop) can copy a lock one of them holds and hang the child. the fork server is a fresh,
+# single-threaded process that imports the chord engine once, so workers forked from it start warm. a bundled
+# executable, or a platform without one, spawns them instead
+@lru_cache(maxsize=None)
+def worker_context():
+    if getattr(sys, 'frozen', False) or 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload(['backend.chord_extractor'])
+    return context
@@ -0,0 +1,204 @@
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from fractions import Fraction
+from music21 import chord, pitch, common, instrument
+from music21.musicxml.xmlToM21 import MeasureParser
+from backend.pcset_table import lookup_chord_name
+
+# chord extraction straight from the MusicXML text, without building a music21 Stream
+# only the current measure is held in memory, offsets come from the <chord/>, <backup> and <forward> cursor
+
+def open_musicxml(score_path):
+    if not zipfile.is_zipfile(score_path):
+        return open(score_path, 'rb')
+
+    # compressed .mxl, the container names the root score file
+    archive = zipfile.ZipFile(score_path)
+    container = ET.fromstring(archive.read('META-INF/container.xml'))
+    rootfile = container.find('.//rootfile')
+    if rootfile is None:
+        raise ValueError(f"No rootfile in {score_path}")
+    return archive.open(rootfile.get('full-path'))
+
+# music21 keeps the previous number for unnumbered measures such as implicit="yes" number="X1"
+def parse_measure_number(number, previous=0):
+    match = re.match(r'\d+', number or '')
+    return int(match.group()) if match else previous
+
+def note_name(pitch_element):
+    step = pitch_element.findtext('step')
+    octave = pitch_element.findtext('octave')
+    alter = round(float(pitch_element.findtext('alter') or 0))
+    accidental = '#' * alter if alter > 0 else '-' * -alter
+    return f'{step}{accidental}{octave}'
+
+# part-name, falling back to the instrument music21 would name the part after
+def score_part_name(score_part):
+    name = (score_part.findtext('part-name') or '').strip()
+    if name:
+        return name
+
+    instrument_name = (score_part.findtext('score-instrument/instrument-name') or '').strip()
+    if instrument_name:
+        return instrument_name
+
+    program = score_part.findtext('midi-instrument/midi-program')
+    if program and program.strip().isdigit():
+        try:
+            return instrument.instrumentFromMidiProgram(int(program) - 1).instrumentName
+        except Exception:
+            return None
+    return None
+
+def pitched_common_name(names):
+    pitches = [pitch.Pitch(n) for n in names]
+    name = lookup_chord_name(pitches)
+    if name is None:
+        name = chord.Chord(pitches).pitchedCommonName
+    return name
+
+class StreamingExtractor:
+    def __init__(self, score_path):
+        self.score_path = score_path
+        self.harmony_parser = MeasureParser()
+        self.part_names = {}
+        self.part_order = []
+
+        # music21 splits multi-staff parts, label_part reproduces label_consecutive_parts over those staves
+        self.previous_staff = None
+
+    def __iter__(self):
+        with open_musicxml(self.score_path) as f:
+            yield from self.parse(f)
+
+    def parse(self, f):
+        part = None
+        part_index = -1
+        measure = None
+        measure_number = 0
+        labels = None
+        divisions = 1
+        position = 0
+        group = None
+
+        for event, element in ET.iterparse(f, events=('start', 'end')):
+            tag = element.tag
+
+            if event == 'start':
+                if tag == 'part':
+                    part = element
+                    part_index += 1
+                    labels = None
+                    divisions = 1
+                    measure_number = 0
+                elif tag == 'measure':
+                    measure = element
+                    measure_number = parse_measure_number(element.get('number'), measure_number)
+                    position = 0
+                continue
+
+            if tag == 'score-part':
+                self.part_names[element.get('id')] = score_part_name(element)
+                self.part_order.append(element.get('id'))
+                element.clear()
+
+            elif tag == 'attributes' and part is not None:
+                divisions = int(float(element.findtext('divisions') or divisions))
+                if labels is None:
+                    labels = self.label_part(part.get('id'), part_index, int(element.findtext('staves') or 1))
+
+            elif tag == 'note' and measure is not None:
+                if labels is None:
+                    labels = self.label_part(part.get('id'), part_index, 1)
+
+                # grace notes take no time and never form extracted chords
+                if element.find('grace') is not None:
+                    element.clear()
+                    continue
+
+                duration = int(float(element.findtext('duration') or 0))
+                pitch_element = element.find('pitch')
+                staff = int(element.findtext('staff') or 1)
+
+                if element.find('chord') is not None and group is not None:
+                    if pitch_element is not None:
+                        group[2].append(note_name(pitch_element))
+                else:
+                    yield from self.emit(group, labels, measure_number, divisions)
+                    group = None
+                    if pitch_element is not None:
+                        group = [position, staff, [note_name(pitch_element)]]
+                    position += duration
+                element.clear()
+
+            # chord symbols are music21 chords too, music21 realises their pitches
+            elif tag == 'harmony' and measure is not None:
+                if labels is None:
+                    labels = self.label_part(part.get('id'), part_index, 1)
+                yield self.harmony_record(element, labels, measure_number, position, divisions)
+                element.clear()
+
+            elif tag in ('backup', 'forward') and measure is not None:
+                yield from self.emit(group, labels, measure_number, divisions)
+                group = None
+                duration = int(float(element.findtext('duration') or 0))
+                position += duration if tag == 'forward' else -duration
+
+            elif tag == 'measure':
+                yield from self.emit(group, labels, measure_number, divisions)
+                group = None
+                measure = None
+                element.clear()
+                part.remove(element)
+
+            elif tag == 'part':
+                part = None
+                element.clear()
+
+    def label_part(self, part_id, part_index, staves):
+        name = self.part_names.get(part_id)
+        if part_index + 1 < len(self.part_order):
+            next_name = self.part_names.get(self.part_order[part_index + 1])
+        else:
+            next_name = object()
+
+        labels = []
+        for staff in range(staves):
+            following = name if staff < staves - 1 else next_name
+
+            # label_consecutive_parts gives this staff its label, then may relabel it once it sees the next one
+            if self.previous_staff is not None and self.previous_staff[0] == name:
+                if 'Bass Clef' not in self.previous_staff[1]:
+                    label = f'{name} (Bass Clef)'
+                else:
+                    label = f'{name} (Additional Clef)'
+            else:
+                label = name or "Unknown Part"
+
+            if following == name and 'Bass Clef' not in label:
+                labels.append(f'{name} (Treble Clef)')
+            else:
+                labels.append(label)
+            self.previous_staff = (name, label)
+        return labels
+
+    def harmony_record(self, element, labels, measure_number, position, divisions):
+        symbol = self.harmony_parser.xmlToChordSymbol(element)
+        onset = position + int(float(element.findtext('offset') or 0))
+        staff = int(element.findtext('staff') or 1)
+        label = labels[min(staff, len(labels)) - 1]
+        offset = common.opFrac(Fraction(onset, divisions))
+        notes = ", ".join(p.nameWithOctave for p in symbol.pitches)
+        return (label, measure_number, offset, symbol.pitchedCommonName, notes)
+
+    def emit(self, group, labels, measure_number, divisions):
+        if group is None or len(group[2]) < 2:
+            return
+        onset, staff, names = group
+        label = labels[min(staff, len(labels)) - 1]
+        offset = common.opFrac(Fraction(onset, divisions))
+        yield (label, measure_number, offset, pitched_common_name(names), ", ".join(names))
+
+def iter_score_chords(score_path):
+    return iter(StreamingExtractor(score_path))
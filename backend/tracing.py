@@ -0,0 +1,215 @@
+import atexit
+import contextlib
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+# opt-in timing of the hot paths, off unless MUSIC_ANALYZER_TRACE is set or the GUI toggle is on
+#   MUSIC_ANALYZER_TRACE=1               trace to music_analyzer_trace_<pid>.json
+#   MUSIC_ANALYZER_TRACE=path/trace.json trace to that file ({pid} is filled in)
+# spans become Chrome trace events (open the file in chrome://tracing or ui.perfetto.dev) and per-name
+# counts and latency histograms, both written with a summary table on exit
+# while disabled, span() and @traced cost one attribute check
+# worker processes exit without running atexit, so pool tasks go through run_traced and their spans
+# travel back to the parent with the result, which merges them into its own trace
+
+TRACE_ENV = 'MUSIC_ANALYZER_TRACE'
+DEFAULT_TRACE_PATH = 'music_analyzer_trace_{pid}.json'
+MAX_EVENTS = 500000  # stats keep counting past this, only the timeline stops growing
+
+# histogram bucket upper bounds in milliseconds
+BUCKETS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000, 5000, float('inf'))
+
+class SpanStats:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * len(BUCKETS_MS)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        ms = seconds * 1000
+        for i, bound in enumerate(BUCKETS_MS):
+            if ms < bound:
+                self.buckets[i] += 1
+                break
+
+    def merge(self, other):
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+
+    # upper bound of the bucket holding the given fraction of calls
+    def percentile(self, fraction):
+        target = fraction * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.buckets):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max * 1000)
+        return self.max * 1000
+
+class Tracer:
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter()
+        self.events = []
+        self.stats = {}
+        self.registered = False
+
+    def enable(self, path=None):
+        self.path = path or self.path or DEFAULT_TRACE_PATH
+        self.enabled = True
+        if not self.registered:
+            self.registered = True
+            atexit.register(self.finish)
+
+    def disable(self):
+        self.enabled = False
+
+    def record(self, name, start, end, args=None):
+        duration = end - start
+        with self.lock:
+            stats = self.stats.get(name)
+            if stats is None:
+                stats = self.stats[name] = SpanStats()
+            stats.add(duration)
+
+            if len(self.events) < MAX_EVENTS:
+                event = {
+                    'name': name,
+                    'ph': 'X',
+                    'ts': (start - self.origin) * 1e6,
+                    'dur': duration * 1e6,
+                    'pid': os.getpid(),
+                    'tid': threading.get_ident(),
+                }
+                if args:
+                    event['args'] = args
+                self.events.append(event)
+
+    @contextlib.contextmanager
+    def active_span(self, name, args):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter(), args)
+
+    def span(self, name, **args):
+        if not self.enabled:
+            return contextlib.nullcontext()
+        return self.active_span(name, args)
+
+    def reset(self):
+        with self.lock:
+            self.events = []
+            self.stats = {}
+
+    # everything recorded since the last take, cleared here, for a worker to hand back to its parent
+    def take(self):
+        with self.lock:
+            events, stats = self.events, self.stats
+            self.events = []
+            self.stats = {}
+        return self.origin, events, stats
+
+    # spans taken in another process, perf_counter is system-wide so timestamps only need the origins lined up
+    def merge(self, taken):
+        origin, events, stats = taken
+        shift = (origin - self.origin) * 1e6
+        with self.lock:
+            room = MAX_EVENTS - len(self.events)
+            self.events.extend(dict(event, ts=event['ts'] + shift) for event in events[:max(0, room)])
+            for name, other in stats.items():
+                self.stats.setdefault(name, SpanStats()).merge(other)
+
+    def dump(self, path=None):
+        path = (path or self.path or DEFAULT_TRACE_PATH).format(pid=os.getpid())
+        with self.lock:
+            events = list(self.events)
+        threads = {event['tid'] for event in events}
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+
+        # thread names make the timeline readable
+        metadata = [{'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': tid,
+                     'args': {'name': names.get(tid, str(tid))}} for tid in threads]
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': metadata + events, 'displayTimeUnit': 'ms'}, f)
+        return path
+
+    def summary(self):
+        with self.lock:
+            items = sorted(self.stats.items(), key=lambda item: -item[1].total)
+        header = f"{'span':<28}{'calls':>8}{'total ms':>12}{'mean ms':>10}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>10}"
+        lines = [header]
+        for name, stats in items:
+            lines.append(f"{name:<28}{stats.count:>8}{stats.total * 1000:>12.1f}{stats.total * 1000 / stats.count:>10.3f}"
+                         f"{stats.percentile(0.5):>9.2f}{stats.percentile(0.95):>9.2f}{stats.max * 1000:>10.2f}")
+
+        bounds = " ".join(f"<{bound:g}" for bound in BUCKETS_MS[:-1]) + " rest"
+        lines.append(f"latency histograms (ms buckets {bounds}):")
+        for name, stats in items:
+            lines.append(f"  {name:<26}" + " ".join(str(count) for count in stats.buckets))
+        return "\n".join(lines)
+
+    def finish(self):
+        if not self.stats:
+            return
+        try:
+            path = self.dump()
+        except OSError as e:
+            print(f"Could not write trace: {e}", file=sys.stderr)
+            path = None
+        print(self.summary(), file=sys.stderr)
+        if path:
+            print(f"Trace written to {path}", file=sys.stderr)
+
+tracer = Tracer()
+
+def span(name, **args):
+    return tracer.span(name, **args)
+
+def traced(name=None):
+    def decorate(function):
+        span_name = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return function(*args, **kwargs)
+            with tracer.active_span(span_name, None):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+# runs a pool task with the parent's tracing switch, returning (result, spans or None)
+def run_traced(enabled, function, *args, **kwargs):
+    tracer.enabled = enabled
+    if enabled:
+        tracer.take()  # anything left from an earlier task was already sent
+    result = function(*args, **kwargs)
+    return result, tracer.take() if enabled else None
+
+# the result of a run_traced task, its spans merged into this process's trace
+def traced_result(value):
+    result, taken = value
+    if taken is not None:
+        tracer.merge(taken)
+    return result
+
+def enable_from_environment():
+    value = os.environ.get(TRACE_ENV, '').strip()
+    if value and value.lower() not in ('0', 'false', 'no', 'off'):
+        tracer.enable(value if value.lower().endswith('.json') else None)
+
+enable_from_environment()
@@ -0,0 +1,287 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.synthetic_score import write_score
+
+# times the parse -> label -> extract -> name -> filter path on synthetic scores
+# python -m benchmarks.run --size medium
+# every run is appended to a JSONL history, each benchmark's median is compared against the median of the
+# last few runs of the same case on the same machine, and a slowdown past its threshold fails the run
+
+HISTORY_PATH = os.path.join(os.path.dirname(__file__), 'history.jsonl')
+
+SIZES = {
+    'small': {'parts': 2, 'measures': 16, 'chords_per_measure': 4, 'notes_per_chord': 3, 'piano_parts': 1},
+    'medium': {'parts': 4, 'measures': 64, 'chords_per_measure': 4, 'notes_per_chord': 4, 'piano_parts': 1},
+    'large': {'parts': 8, 'measures': 256, 'chords_per_measure': 4, 'notes_per_chord': 4, 'piano_parts': 2},
+}
+
+DEFAULT_THRESHOLD = 0.25  # 25% slower than the baseline median
+
+# what the extractor's filter boxes typically send
+FILTER_QUERIES = [
+    {},
+    {'part': 'piano'},
+    {'measure_from': '10', 'measure_until': '20'},
+    {'beat_from': '1', 'beat_until': '2'},
+    {'chord': 'seventh'},
+    {'chord': 'maj'},
+    {'part': 'instrument', 'measure_from': '5', 'chord': 'triad'},
+]
+
+class Context:
+    def __init__(self, score_path):
+        from backend.chord_extractor import get_score_parts, label_consecutive_parts, extract_score_chords
+        from backend.chord_store import ChordTable
+        from music21 import chord
+
+        self.score_path = score_path
+        self.parts = get_score_parts(score_path)
+        self.part_names = [part.partName for part in self.parts]
+        label_consecutive_parts(self.parts)
+        self.rows = extract_score_chords(score_path)
+        self.table = ChordTable(self.rows)
+        self.note_sets = list(dict.fromkeys(tuple(row[4].split(", ")) for row in self.rows))
+        self.chords = [chord.Chord(list(notes)) for notes in self.note_sets]
+
+def bench_parse(context):
+    from backend.chord_extractor import get_score_parts
+    return None, lambda _: get_score_parts(context.score_path)
+
+def bench_label(context):
+    from backend.chord_extractor import label_consecutive_parts
+
+    def setup():
+        for part, name in zip(context.parts, context.part_names):
+            part.partName = name
+    return setup, lambda _: label_consecutive_parts(context.parts)
+
+def bench_extract(context):
+    from backend.chord_extractor import extract_chords
+    return None, lambda _: extract_chords(context.parts)
+
+def bench_stream_extract(context):
+    from backend.stream_extractor import iter_score_chords
+    return None, lambda _: list(iter_score_chords(context.score_path))
+
+# the same score written out as MIDI, read back without music21
+def bench_midi_read(context):
+    from backend.midi_reader import read_midi_chords
+    from music21 import converter
+    midi_path = os.path.splitext(context.score_path)[0] + '.mid'
+    converter.parse(context.score_path).write('midi', fp=midi_path)
+    return None, lambda _: read_midi_chords(midi_path)
+
+def name_all(context):
+    from backend.find_chord import get_chord_name
+    for notes in context.note_sets:
+        get_chord_name(list(notes), simplify_chords=True)
+
+def bench_name_cold(context):
+    from backend.find_chord import chord_name_cache
+    return chord_name_cache.clear, lambda _: name_all(context)
+
+def bench_name_warm(context):
+    def setup():
+        name_all(context)
+    return setup, lambda _: name_all(context)
+
+def bench_relationship(context):
+    from backend.find_chord import get_chord_relationship
+
+    def run(_):
+        for c in context.chords:
+            get_chord_relationship(c, 'C', True)
+    return None, run
+
+def bench_detect_keys(context):
+    from backend.key_detection import detect_measure_keys
+    return None, lambda _: detect_measure_keys(context.parts)
+
+def bench_table_build(context):
+    from backend.chord_store import ChordTable
+    return None, lambda _: ChordTable(context.rows)
+
+PROGRESSION_QUERIES = ['ii V7 I', 'I bVI', 'V7 I', 'ii* V* I*']
+
+def bench_progression(context):
+    from backend.progression_index import ProgressionIndex
+
+    def run(_):
+        index = ProgressionIndex(context.table)
+        for pattern in PROGRESSION_QUERIES:
+            index.search(pattern)
+    return None, run
+
+def bench_filter_build(context):
+    from backend.chord_query import ChordQuery
+    return None, lambda _: ChordQuery(context.table)
+
+def bench_filter(context):
+    from backend.chord_query import ChordQuery, BY_INSTRUMENT, BY_MEASURE_AND_BEAT
+
+    def setup():
+        return ChordQuery(context.table)
+
+    def run(query):
+        for order in (BY_INSTRUMENT, BY_MEASURE_AND_BEAT):
+            for options in FILTER_QUERIES:
+                query.filter(order, **options)
+    return setup, run
+
+BENCHMARKS = {
+    'parse': bench_parse,
+    'label': bench_label,
+    'extract': bench_extract,
+    'stream_extract': bench_stream_extract,
+    'midi_read': bench_midi_read,
+    'name_cold': bench_name_cold,
+    'name_warm': bench_name_warm,
+    'relationship': bench_relationship,
+    'detect_keys': bench_detect_keys,
+    'table_build': bench_table_build,
+    'filter_build': bench_filter_build,
+    'filter': bench_filter,
+    'progression': bench_progression,
+}
+
+def measure(benchmark, context, repeat):
+    setup, run = benchmark(context)
+    times = []
+    for _ in range(repeat):
+        state = setup() if setup else None
+        start = time.perf_counter()
+        run(state)
+        times.append(time.perf_counter() - start)
+    return {'median': statistics.median(times), 'min': min(times), 'repeat': repeat}
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(__file__), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def load_history(path):
+    entries = []
+    if not os.path.exists(path):
+        return entries
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue
+    return entries
+
+# median of the previous runs' medians, per benchmark
+def baseline(history, case, machine, window):
+    runs = [entry for entry in history if entry.get('case') == case and entry.get('machine') == machine][-window:]
+    medians = {}
+    for entry in runs:
+        for name, result in entry.get('results', {}).items():
+            medians.setdefault(name, []).append(result['median'])
+    return {name: statistics.median(values) for name, values in medians.items()}, len(runs)
+
+def parse_thresholds(items):
+    thresholds = {}
+    for item in items or []:
+        name, _, value = item.partition('=')
+        if name not in BENCHMARKS or not value:
+            raise argparse.ArgumentTypeError(f"expected BENCHMARK=FRACTION, got {item!r}")
+        thresholds[name] = float(value)
+    return thresholds
+
+def find_regressions(results, base, default_threshold, thresholds):
+    regressions = []
+    for name, result in results.items():
+        if name not in base or base[name] <= 0:
+            continue
+        ratio = result['median'] / base[name]
+        if ratio > 1 + thresholds.get(name, default_threshold):
+            regressions.append((name, result['median'], base[name], ratio))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.run', description="Time the extraction pipeline on synthetic scores")
+    parser.add_argument('--size', choices=sorted(SIZES), default='medium')
+    parser.add_argument('--parts', type=int, help="override the size preset")
+    parser.add_argument('--measures', type=int, help="override the size preset")
+    parser.add_argument('--chords-per-measure', type=int, help="override the size preset")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help="run a subset of the benchmarks")
+    parser.add_argument('--history', default=HISTORY_PATH, help="JSONL file runs are appended to and compared against")
+    parser.add_argument('--window', type=int, default=5, help="how many previous runs make up the baseline")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help="allowed slowdown as a fraction (0.25 = 25%%)")
+    parser.add_argument('--threshold-for', action='append', metavar='BENCHMARK=FRACTION', help="per-benchmark threshold, repeatable")
+    parser.add_argument('--no-record', action='store_true', help="compare only, don't append this run to the history")
+    args = parser.parse_args(argv)
+
+    try:
+        thresholds = parse_thresholds(args.threshold_for)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+
+    case = dict(SIZES[args.size], seed=args.seed)
+    for option in ('parts', 'measures', 'chords_per_measure'):
+        if getattr(args, option) is not None:
+            case[option] = getattr(args, option)
+
+    with tempfile.TemporaryDirectory() as directory:
+        score_path = write_score(os.path.join(directory, 'synthetic.musicxml'), **case)
+        context = Context(score_path)
+
+        results = {}
+        for name in args.only or BENCHMARKS:
+            results[name] = measure(BENCHMARKS[name], context, args.repeat)
+
+    history = load_history(args.history)
+    machine = platform.node()
+    base, base_runs = baseline(history, case, machine, args.window)
+    regressions = find_regressions(results, base, args.threshold, thresholds)
+    regressed = {name for name, *_ in regressions}
+
+    print(f"{len(context.rows)} chords, {len(context.note_sets)} distinct note sets, {len(context.parts)} parts "
+          f"(baseline: {base_runs} previous runs)")
+    print(f"{'benchmark':<16}{'median':>12}{'min':>12}{'baseline':>12}{'change':>10}")
+    for name, result in results.items():
+        if name in base:
+            change = f"{(result['median'] / base[name] - 1) * 100:+.1f}%"
+            base_text = f"{base[name] * 1000:.2f}ms"
+        else:
+            change = base_text = "-"
+        flag = "  REGRESSION" if name in regressed else ""
+        print(f"{name:<16}{result['median'] * 1000:>10.2f}ms{result['min'] * 1000:>10.2f}ms{base_text:>12}{change:>10}{flag}")
+
+    if not args.no_record:
+        from music21 import __version__ as music21_version
+        entry = {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'commit': git_commit(),
+            'machine': machine,
+            'python': platform.python_version(),
+            'music21': music21_version,
+            'case': case,
+            'results': results,
+        }
+        with open(args.history, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + "\n")
+
+    if regressions:
+        for name, current, previous, ratio in regressions:
+            allowed = thresholds.get(name, args.threshold)
+            print(f"{name} is {(ratio - 1) * 100:.1f}% slower than its baseline (allowed {allowed * 100:.0f}%)", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
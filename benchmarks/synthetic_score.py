@@ -0,0 +1,106 @@
+import argparse
+import random
+from xml.sax.saxutils import escape
+
+# MusicXML scores of a controlled size for the benchmarks, same seed gives the same score
+# every part is 4/4 in C with divisions=4 (a sixteenth is 1), chords are stacked thirds on random roots
+# piano parts get two staves so music21 splits them and label_consecutive_parts has work to do
+
+STEPS = ['C', 'D', 'E', 'F', 'G', 'A', 'B']
+DIVISIONS = 4
+MEASURE_LENGTH = 4 * DIVISIONS
+CHORD_DURATIONS = {1: 'whole', 2: 'half', 4: 'quarter', 8: 'eighth', 16: '16th'}
+
+def chord_pitches(rng, notes_per_chord, low_octave):
+    root = rng.randrange(len(STEPS))
+    pitches = []
+    for i in range(notes_per_chord):
+        degree = root + 2 * i  # stacked thirds
+        step = STEPS[degree % 7]
+        octave = low_octave + degree // 7
+        alter = rng.choice((0, 0, 0, 1, -1))
+        pitches.append((step, alter, octave))
+    return pitches
+
+def note_xml(step, alter, octave, duration, note_type, is_chord, staff=None):
+    parts = ['<note>']
+    if is_chord:
+        parts.append('<chord/>')
+    parts.append(f'<pitch><step>{step}</step>')
+    if alter:
+        parts.append(f'<alter>{alter}</alter>')
+    parts.append(f'<octave>{octave}</octave></pitch>')
+    parts.append(f'<duration>{duration}</duration><type>{note_type}</type>')
+    if staff:
+        parts.append(f'<staff>{staff}</staff>')
+    parts.append('</note>')
+    return ''.join(parts)
+
+def staff_xml(rng, chords_per_measure, notes_per_chord, low_octave, staff=None):
+    duration = MEASURE_LENGTH // chords_per_measure
+    note_type = CHORD_DURATIONS[chords_per_measure]
+    xml = []
+    for _ in range(chords_per_measure):
+        for i, (step, alter, octave) in enumerate(chord_pitches(rng, notes_per_chord, low_octave)):
+            xml.append(note_xml(step, alter, octave, duration, note_type, i > 0, staff))
+    return xml
+
+def generate_score(parts=4, measures=32, chords_per_measure=4, notes_per_chord=4, piano_parts=1, seed=0):
+    if chords_per_measure not in CHORD_DURATIONS:
+        raise ValueError(f"chords_per_measure must be one of {sorted(CHORD_DURATIONS)}")
+
+    rng = random.Random(seed)
+    part_list = []
+    part_bodies = []
+
+    for index in range(parts):
+        part_id = f'P{index + 1}'
+        piano = index < piano_parts
+        name = 'Piano' if piano else f'Instrument {index + 1}'
+        part_list.append(f'<score-part id="{part_id}"><part-name>{escape(name)}</part-name></score-part>')
+
+        body = [f'<part id="{part_id}">']
+        for number in range(1, measures + 1):
+            body.append(f'<measure number="{number}">')
+            if number == 1:
+                staves = '<staves>2</staves><clef number="1"><sign>G</sign><line>2</line></clef><clef number="2"><sign>F</sign><line>4</line></clef>' if piano else '<clef><sign>G</sign><line>2</line></clef>'
+                body.append(f'<attributes><divisions>{DIVISIONS}</divisions><key><fifths>0</fifths></key>'
+                            f'<time><beats>4</beats><beat-type>4</beat-type></time>{staves}</attributes>')
+            if piano:
+                body.extend(staff_xml(rng, chords_per_measure, notes_per_chord, 4, staff=1))
+                body.append(f'<backup><duration>{MEASURE_LENGTH}</duration></backup>')
+                body.extend(staff_xml(rng, chords_per_measure, notes_per_chord, 2, staff=2))
+            else:
+                body.extend(staff_xml(rng, chords_per_measure, notes_per_chord, 3 + index % 2))
+            body.append('</measure>')
+        body.append('</part>')
+        part_bodies.append(''.join(body))
+
+    return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<!DOCTYPE score-partwise PUBLIC "-//Recordare//DTD MusicXML 3.1 Partwise//EN" "http://www.musicxml.org/dtds/partwise.dtd">\n'
+            '<score-partwise version="3.1">'
+            f'<part-list>{"".join(part_list)}</part-list>'
+            f'{"".join(part_bodies)}'
+            '</score-partwise>\n')
+
+def write_score(path, **options):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(generate_score(**options))
+    return path
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.synthetic_score', description="Write a synthetic MusicXML score")
+    parser.add_argument('output')
+    parser.add_argument('--parts', type=int, default=4)
+    parser.add_argument('--measures', type=int, default=32)
+    parser.add_argument('--chords-per-measure', type=int, default=4, choices=sorted(CHORD_DURATIONS))
+    parser.add_argument('--notes-per-chord', type=int, default=4)
+    parser.add_argument('--piano-parts', type=int, default=1, help="how many of the parts get a second (bass clef) staff")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    write_score(args.output, parts=args.parts, measures=args.measures, chords_per_measure=args.chords_per_measure,
+                notes_per_chord=args.notes_per_chord, piano_parts=args.piano_parts, seed=args.seed)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+import time
+import numpy as np
+import pygame
+from frontend.assets.sample_bank import sample_bank, note_to_midi
+
+# mixes every sounding note into one buffer instead of giving each note its own pygame channel
+# pygame only has 8 channels, so big chords used to steal the oldest notes
+# the mix is re-rendered whenever a note starts or is released, sounding notes carry on from where
+# they are (by elapsed time) and two channels crossfade so the switch isn't audible
+
+ATTACK_SECONDS = 0.005
+RELEASE_SECONDS = 0.25
+CROSSFADE_MS = 15
+
+class Voice:
+    def __init__(self, samples, start):
+        self.samples = samples  # view into the bank's Sound, never copied
+        self.start = start
+        self.release = None
+
+class ChordMixer:
+    def __init__(self, bank=sample_bank):
+        self.bank = bank
+        self.voices = {}  # MIDI number -> Voice, one voice per physical key
+        self.channels = None
+        self.current = 0
+
+    def ready(self):
+        if self.channels is None:
+            if not self.bank.init_mixer():
+                return False
+            self.frequency = pygame.mixer.get_init()[0]
+            self.channels = (pygame.mixer.Channel(0), pygame.mixer.Channel(1))
+            pygame.mixer.set_reserved(2)  # nothing else may grab the mix channels
+        return True
+
+    def samples(self, note):
+        sound = self.bank.get(note)
+        if sound is None:
+            return None
+        return pygame.sndarray.samples(sound)
+
+    def note_on(self, note, render=True):
+        midi = note_to_midi(note)
+        samples = self.samples(note) if self.ready() else None
+        if samples is None:
+            return False
+
+        # the same key again restarts it, whatever spelling was clicked
+        self.voices[midi] = Voice(samples, time.perf_counter())
+        if render:
+            self.render()
+        return True
+
+    def note_off(self, note, render=True):
+        voice = self.voices.get(note_to_midi(note))
+        if voice is not None and voice.release is None:
+            voice.release = time.perf_counter()
+            if render:
+                self.render()
+
+    # lets every note ring out except the given ones
+    def release_all(self, keep=(), render=True):
+        kept = {note_to_midi(note) for note in keep}
+        now = time.perf_counter()
+        for midi, voice in self.voices.items():
+            if midi not in kept and voice.release is None:
+                voice.release = now
+        if render:
+            self.render()
+
+    def play_chord(self, notes):
+        if not self.ready():
+            return
+        self.release_all(render=False)
+        for note in notes:
+            self.note_on(note, render=False)
+        self.render()
+
+    def stop(self):
+        self.voices.clear()
+        if self.channels is not None:
+            for channel in self.channels:
+                channel.stop()
+
+    def voice_frames(self, voice, now):
+        position = int((now - voice.start) * self.frequency)
+        end = len(voice.samples)
+        if voice.release is not None:
+            end = min(end, int((voice.release - voice.start + RELEASE_SECONDS) * self.frequency))
+        return position, end
+
+    def envelope(self, voice, position, end):
+        frames = np.arange(position, end, dtype=np.float32)
+        gain = np.minimum(1.0, frames / (ATTACK_SECONDS * self.frequency))
+        if voice.release is not None:
+            released = (voice.release - voice.start) * self.frequency
+            gain *= np.clip(1.0 - (frames - released) / (RELEASE_SECONDS * self.frequency), 0.0, 1.0)
+        return gain
+
+    def render(self):
+        if not self.ready():
+            return
+        now = time.perf_counter()
+
+        spans = {}
+        for midi, voice in list(self.voices.items()):
+            position, end = self.voice_frames(voice, now)
+            if position >= end:
+                del self.voices[midi]  # finished or fully released
+            else:
+                spans[midi] = (position, end)
+
+        previous = self.channels[self.current]
+        if not spans:
+            previous.fadeout(CROSSFADE_MS)
+            return
+
+        length = max(end - position for position, end in spans.values())
+        first = next(iter(self.voices.values())).samples
+        mix = np.zeros((length,) + first.shape[1:], dtype=np.float32)
+
+        for midi, (position, end) in spans.items():
+            voice = self.voices[midi]
+            gain = self.envelope(voice, position, end)
+            segment = voice.samples[position:end].astype(np.float32)
+            if segment.ndim > 1:
+                gain = gain[:, None]
+            mix[:end - position] += segment * gain
+
+        # notes add up, scale by sqrt(n) then clip rather than wrapping around
+        mix /= max(1.0, np.sqrt(len(spans)) * 0.75)
+        if np.issubdtype(first.dtype, np.integer):
+            limits = np.iinfo(first.dtype)
+            mix = np.clip(mix, limits.min, limits.max)
+        else:
+            mix = np.clip(mix, -1.0, 1.0)
+        sound = pygame.sndarray.make_sound(np.ascontiguousarray(mix.astype(first.dtype)))
+
+        # the old mix fades out while the new one fades in on the other channel
+        self.current = 1 - self.current
+        previous.fadeout(CROSSFADE_MS)
+        self.channels[self.current].play(sound, fade_ms=CROSSFADE_MS)
+
+# one mixer owns the two reserved channels, shared by every keyboard
+chord_mixer = ChordMixer()
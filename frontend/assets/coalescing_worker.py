@@ -0,0 +1,63 @@
+import threading
+
+# runs one function on a background thread for the newest request only
+# submit() replaces whatever is still waiting, a result is only kept if no newer request came in while it ran,
+# so a burst of keystrokes costs at most one evaluation in flight plus one for the final input
+# the GUI polls results from after() callbacks, the function never touches Tk widgets
+class CoalescingWorker:
+    def __init__(self, function, name='worker'):
+        self.function = function
+        self.name = name
+        self.condition = threading.Condition()
+        self.generation = 0
+        self.pending = None  # (generation, args) waiting to run
+        self.result = None  # (generation, value) of the newest finished request
+        self.thread = None
+        self.closed = False
+
+    def submit(self, *args):
+        with self.condition:
+            self.generation += 1
+            self.pending = (self.generation, args)
+            self.result = None
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name=self.name, daemon=True)
+                self.thread.start()
+            self.condition.notify()
+            return self.generation
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.pending is None and not self.closed:
+                    self.condition.wait()
+                if self.closed:
+                    return
+                generation, args = self.pending
+                self.pending = None
+
+            try:
+                value = self.function(*args)
+            except Exception as e:
+                print(f"Background evaluation failed: {e}")
+                value = None
+
+            with self.condition:
+                # anything submitted meanwhile makes this stale
+                if generation == self.generation:
+                    self.result = (generation, value)
+
+    # (True, value) once the newest request has finished, (False, None) otherwise
+    def poll(self):
+        with self.condition:
+            if self.result is None:
+                return False, None
+            _, value = self.result
+            self.result = None
+            return True, value
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.pending = None
+            self.condition.notify()
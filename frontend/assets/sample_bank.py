@@ -0,0 +1,113 @@
+import os
+import re
+import sys
+import threading
+import pygame
+
+# piano samples shared by every VirtualKeyboard, keyed by MIDI number
+# sounds/ holds one WAV per spelling (C#4.wav, Db4.wav, D-4.wav ... are the same recording),
+# only one file per physical key is decoded, the first time it's needed or by the background preload
+
+NOTE_PATTERN = re.compile(r'^([A-Ga-g])([#b-]*)(-?\d+)$')
+STEP_SEMITONES = {'C': 0, 'D': 2, 'E': 4, 'F': 5, 'G': 7, 'A': 9, 'B': 11}
+
+# 'Bb0', 'B-0' and 'A#0' -> 22, octave numbers follow the written letter like music21 ('B#3' is C4)
+def note_to_midi(note):
+    match = NOTE_PATTERN.match(note or '')
+    if not match:
+        return None
+    step, accidentals, octave = match.groups()
+    alter = accidentals.count('#') - accidentals.count('b') - accidentals.count('-')
+    return 12 * (int(octave) + 1) + STEP_SEMITONES[step.upper()] + alter
+
+def sounds_directory():
+    if hasattr(sys, '_MEIPASS'):
+        return os.path.join(sys._MEIPASS, 'sounds')
+    return 'sounds'
+
+class SampleBank:
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.paths = None  # MIDI number -> file, found on first use
+        self.sounds = {}
+        self.lock = threading.Lock()
+        self.mixer_ready = None
+        self.preload_thread = None
+
+    # pygame.mixer.init is process-wide, calling it again per window only costs time
+    def init_mixer(self):
+        if self.mixer_ready is None:
+            try:
+                if not pygame.mixer.get_init():
+                    pygame.mixer.init()
+                self.mixer_ready = True
+            except pygame.error as e:
+                print(f"Audio unavailable: {e}")
+                self.mixer_ready = False
+        return self.mixer_ready
+
+    def scan(self):
+        directory = self.directory or sounds_directory()
+        paths = {}
+        try:
+            names = sorted(os.listdir(directory))
+        except OSError as e:
+            print(f"Sound folder not found: {e}")
+            names = []
+        for name in names:
+            base, extension = os.path.splitext(name)
+            midi = note_to_midi(base)
+            if extension.lower() == '.wav' and midi is not None:
+                paths.setdefault(midi, os.path.join(directory, name))
+        return paths
+
+    def load(self, midi):
+        with self.lock:
+            if self.paths is None:
+                self.paths = self.scan()
+            if midi in self.sounds:
+                return self.sounds[midi]
+
+            path = self.paths.get(midi)
+            sound = None
+            if path is not None:
+                try:
+                    sound = pygame.mixer.Sound(path)
+                except pygame.error:
+                    print(f"Sound file for MIDI {midi} could not be loaded: {path}")
+            else:
+                print(f"Sound file for MIDI {midi} not found")
+
+            # failures are remembered too, so a missing file is only reported once
+            self.sounds[midi] = sound
+            return sound
+
+    def get(self, note):
+        if not self.init_mixer():
+            return None
+        midi = note_to_midi(note)
+        if midi is None:
+            return None
+        sound = self.sounds.get(midi)
+        if sound is None and midi not in self.sounds:
+            sound = self.load(midi)
+        return sound
+
+    # decode every key on a daemon thread, notes played before it gets there are loaded on demand
+    def preload(self):
+        if self.preload_thread is not None or not self.init_mixer():
+            return
+
+        def run():
+            with self.lock:
+                if self.paths is None:
+                    self.paths = self.scan()
+                midis = sorted(self.paths)
+            for midi in midis:
+                if midi not in self.sounds:
+                    self.load(midi)
+
+        self.preload_thread = threading.Thread(target=run, name='sample-preload', daemon=True)
+        self.preload_thread.start()
+
+sample_bank = SampleBank()
@@ -1,6 +1,7 @@
 import customtkinter as ctk
-import pygame
-import sys, os
+from frontend.assets.sample_bank import sample_bank, note_to_midi
+from frontend.assets.chord_mixer import chord_mixer
+from backend.tracing import traced
 
 class VirtualKeyboard(ctk.CTkFrame):
     def __init__(self, parent, update_chord_callback, sound, sustain, free_play, color, *args, **kwargs):
@@ -17,58 +18,27 @@ class VirtualKeyboard(ctk.CTkFrame):
         self.free_play = free_play
         self.color = color
         self.create_keys()
-        pygame.mixer.init()
-        self.current_sounds = []
-        self.current_sound = None
-        self.note_sounds = self.load_note_sounds()
-    
-    def load_note_sounds(self):
-        note_sounds = {}
-
-        if hasattr(sys, '_MEIPASS'):
-            base_path = os.path.join(sys._MEIPASS, 'sounds')
-        else:
-            base_path = 'sounds'
-
-        for note in self.note_to_key_mapping.keys():
-            try:
-                sound_file_path = os.path.join(base_path, f'{note}.wav')
-                note_sounds[note] = pygame.mixer.Sound(sound_file_path)
-            except pygame.error:
-                print(f"Sound file for {note} not found: {sound_file_path}")
-        return note_sounds
+        self.build_indexes()
+        self.highlighted = set()  # MIDI numbers currently drawn in self.color
+        
+        # samples are shared between windows, only the first finder pays for decoding
+        sample_bank.preload()
 
+    # notes are mixed into one buffer, so sustain has no channel limit and released notes fade out
     def play_note_sound(self, note):
-        sound = self.note_sounds.get(note)
-        if not sound:
-            return
-        
         if self.sustain:
-            # prevent sound layering with same notes
-            for current_sound in self.current_sounds:
-                if current_sound.get_raw() == sound.get_raw():
-                    current_sound.stop()
-                    self.current_sounds.remove(current_sound)
-                    break
-
-            if len(self.current_sounds) >= 8:  # pygame only has 8 sound channels
-                old_sound = self.current_sounds.pop(0)
-                old_sound.stop()
-
-            self.current_sounds.append(sound)
-            sound.play()
-        
+            chord_mixer.note_on(note)
         else:
-            if self.current_sound:
-                self.current_sound.stop()
+            chord_mixer.release_all(render=False)
+            chord_mixer.note_on(note)
 
-            sound = self.note_sounds.get(note)
-            if sound:
-                self.current_sound = sound
-                sound.play()
+    # every note of a chord at once, whatever was ringing before is released
+    def play_chord(self, notes):
+        chord_mixer.play_chord(notes)
 
     def create_keys(self):
         self.keys = {}
+        self.black_key_ids = set()
         white_key_width = 25
         white_key_height = 100
         black_key_width = 15
@@ -103,6 +73,7 @@ class VirtualKeyboard(ctk.CTkFrame):
                     width = border_width)
                 
                 self.keys[f'Bl{i + 1}'] = key_id
+                self.black_key_ids.add(key_id)
                 self.key_click_state[key_id] = 0
                 self.canvas.tag_bind(key_id, "<Button-1>", self.key_click_handler)
     
@@ -165,11 +136,25 @@ class VirtualKeyboard(ctk.CTkFrame):
             'Cb8': 'Wh51',
         }
         
+    # lookups the click and highlight paths need, built once instead of scanning keys/mapping per event
+    def build_indexes(self):
+        self.key_notes = {}  # key -> spellings, in mapping order (first is the default, second the shift-click one)
+        for note, key in self.note_to_key_mapping.items():
+            self.key_notes.setdefault(key, []).append(note)
+
+        self.id_to_key = {key_id: key for key, key_id in self.keys.items()}
+        self.midi_to_key_id = {}
+        self.key_id_to_midi = {}
+        for key, notes in self.key_notes.items():
+            midi = note_to_midi(notes[0])
+            self.midi_to_key_id[midi] = self.keys[key]
+            self.key_id_to_midi[self.keys[key]] = midi
+
     def note_to_key(self, note):
         return self.note_to_key_mapping.get(note, None)
     
     def get_note_from_key(self, key, second_mapping=False):
-        notes = [note for note, mapped_key in self.note_to_key_mapping.items() if mapped_key == key]
+        notes = self.key_notes.get(key, [])
         
         if second_mapping and len(notes) > 1:
             return notes[1]  
@@ -177,46 +162,58 @@ class VirtualKeyboard(ctk.CTkFrame):
             return notes[0]
         return None
     
+    def base_color(self, key_id):
+        return 'black' if key_id in self.black_key_ids else 'white'
+
+    # only keys whose state changes are redrawn
+    def set_highlighted(self, notes):
+        self.set_highlighted_midis({midi for midi in map(note_to_midi, notes) if midi in self.midi_to_key_id})
+
+    def is_highlighted(self, key_id):
+        return self.key_id_to_midi.get(key_id) in self.highlighted
+
     def highlight_key(self, note, highlight=True): 
-        key = self.note_to_key(note)
-        
-        if note is not None:
-            key_id = self.keys.get(key)
-            if key_id:
-                if highlight:
-                    color = self.color
-                self.canvas.itemconfig(key_id, fill=color)
+        if note is None:
+            return
+        midi = note_to_midi(note)
+        if midi is None or midi not in self.midi_to_key_id:
+            return
+        if highlight:
+            self.set_highlighted_midis(self.highlighted | {midi})
+        else:
+            self.set_highlighted_midis(self.highlighted - {midi})
     
+    def set_highlighted_midis(self, midis):
+        for midi in self.highlighted ^ midis:
+            key_id = self.midi_to_key_id[midi]
+            self.canvas.itemconfig(key_id, fill=self.color if midi in midis else self.base_color(key_id))
+        self.highlighted = set(midis)
     
     def reset_all_keys(self):
-        for key_id in self.keys.values():
-            if self.canvas.itemcget(key_id, 'fill') == self.color:
-                if 'black' in self.canvas.gettags(key_id):
-                    self.canvas.itemconfig(key_id, fill='black')
-                else:
-                    self.canvas.itemconfig(key_id, fill='white')
+        self.set_highlighted_midis(set())
     
+    @traced()
     def key_click_handler(self, event):
         x, y = event.x, event.y
         clicked_item = self.canvas.find_closest(x, y)[0]
-        for key, key_id in self.keys.items():
-            if key_id == clicked_item:
-                
-                note = self.get_note_from_key(key)
-                shift_held = event.state & 0x0001
-                if shift_held:
-                    note = self.get_note_from_key(key, second_mapping=True)
-                
-                self.last_clicked_note = note
-                
-                if self.free_play:
-                    self.play_note_sound(note)
-                else:
-                    key_color = self.canvas.itemcget(key_id, 'fill')
-                    if self.sound and key_color != self.color:
-                        self.play_note_sound(note)
-                    
-                    self.update_chord_callback(keyboard_triggered=True)
+        key = self.id_to_key.get(clicked_item)
+        if key is None:
+            return
+        
+        note = self.get_note_from_key(key)
+        shift_held = event.state & 0x0001
+        if shift_held:
+            note = self.get_note_from_key(key, second_mapping=True)
+        
+        self.last_clicked_note = note
+        
+        if self.free_play:
+            self.play_note_sound(note)
+        else:
+            if self.sound and not self.is_highlighted(clicked_item):
+                self.play_note_sound(note)
+            
+            self.update_chord_callback(keyboard_triggered=True)
     
     def toggle_sound(self, sound):
         self.sound = sound
@@ -226,13 +223,15 @@ class VirtualKeyboard(ctk.CTkFrame):
         
         # simulate letting go of sustain pedal, most recent note still plays to be less jarring
         if (self.sustain == False):
-            for s in self.current_sounds[:-1]:
-                s.stop()
+            keep = [self.last_clicked_note] if self.last_clicked_note else []
+            chord_mixer.release_all(keep=keep)
         
     def toggle_free_play(self, free_play):
         self.free_play = free_play
     
     def setColor(self, color):
         self.color = color
+        for midi in self.highlighted:
+            self.canvas.itemconfig(self.midi_to_key_id[midi], fill=color)
 
             
\ No newline at end of file
@@ -0,0 +1,176 @@
+import tkinter.font as tkfont
+from tkinter import ttk
+import customtkinter as ctk
+
+# Treeview that only materialises the rows in view (plus a small buffer)
+# rows are kept in a plain list, scrolling and selection work on indices into that list
+class VirtualTable(ctk.CTkFrame):
+    BUFFER_ROWS = 5
+    SHIFT_MASK = 0x0001
+    CONTROL_MASK = 0x0004 | 0x0008  # Control, and Command (Mod1) on macOS
+
+    def __init__(self, parent, columns, format_row=None, *args, **kwargs):
+        super().__init__(parent, *args, **kwargs)
+        self.rows = []
+        self.first = 0
+        self.slots = []  # item ids currently in the tree, slot i shows row self.first + i
+        self.selected = set()
+        self.anchor = None
+        self.format_row = format_row or (lambda row: row)
+
+        self.tree = ttk.Treeview(self, columns=columns, show="headings", selectmode="extended")
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.on_scrollbar)
+        self.scrollbar.pack(side=ctk.RIGHT, fill=ctk.Y)
+        self.tree.pack(side=ctk.LEFT, fill=ctk.BOTH, expand=True)
+
+        self.tree.bind("<Configure>", lambda event: self.render())
+        self.tree.bind("<Button-1>", self.on_click)
+        self.tree.bind("<MouseWheel>", self.on_mouse_wheel)
+        self.tree.bind("<Button-4>", lambda event: self.scroll(-3))
+        self.tree.bind("<Button-5>", lambda event: self.scroll(3))
+        self.tree.bind("<Up>", lambda event: self.move_selection(-1, event))
+        self.tree.bind("<Down>", lambda event: self.move_selection(1, event))
+        self.tree.bind("<Prior>", lambda event: self.scroll(-self.visible_count()))
+        self.tree.bind("<Next>", lambda event: self.scroll(self.visible_count()))
+
+    # keep_position is for rows growing underneath the user (a score still loading), scroll and selection stay put
+    def set_rows(self, rows, keep_position=False):
+        if keep_position:
+            self.follow_selection(rows)
+        else:
+            self.first = 0
+            self.selected.clear()
+            self.anchor = None
+        self.rows = rows
+        self.render()
+
+    # a row's identity, its index in the underlying table for views that have one
+    def row_identity(self, rows, i):
+        return rows.table_index(i) if hasattr(rows, 'table_index') else rows[i]
+
+    # selected rows stay selected wherever they end up in the new rows, and vanish if they were filtered out
+    def follow_selection(self, rows):
+        old = self.rows
+        chosen = {self.row_identity(old, i) for i in self.selected if i < len(old)}
+        anchor = self.row_identity(old, self.anchor) if self.anchor is not None and self.anchor < len(old) else None
+        self.selected = set()
+        self.anchor = None
+        if not chosen and anchor is None:
+            return
+
+        for i in range(len(rows)):
+            identity = self.row_identity(rows, i)
+            if identity in chosen:
+                self.selected.add(i)
+            if identity == anchor:
+                self.anchor = i
+
+    def refresh(self):
+        self.render()
+
+    def selected_indices(self):
+        return [i for i in sorted(self.selected) if i < len(self.rows)]
+
+    def selected_rows(self):
+        return [self.rows[i] for i in self.selected_indices()]
+
+    def row_height(self):
+        height = ttk.Style().lookup('Treeview', 'rowheight')
+        if height:
+            return int(height)
+        return tkfont.nametofont('TkDefaultFont').metrics('linespace') + 4
+
+    def visible_count(self):
+        # header takes roughly one row
+        return max(1, self.tree.winfo_height() // self.row_height() - 1)
+
+    def render(self):
+        visible = self.visible_count()
+        self.first = max(0, min(self.first, len(self.rows) - visible))
+        count = min(visible + self.BUFFER_ROWS, len(self.rows) - self.first)
+
+        # reuse existing items, only the difference in row count is inserted or deleted
+        while len(self.slots) < count:
+            self.slots.append(self.tree.insert("", "end", tags=("padding",)))
+        while len(self.slots) > count:
+            self.tree.delete(self.slots.pop())
+
+        selection = []
+        for slot, item in enumerate(self.slots):
+            index = self.first + slot
+            self.tree.item(item, values=self.format_row(self.rows[index]))
+            if index in self.selected:
+                selection.append(item)
+        self.tree.selection_set(selection)
+        self.update_scrollbar(visible)
+
+    def update_scrollbar(self, visible):
+        total = len(self.rows)
+        if total == 0:
+            self.scrollbar.set(0, 1)
+        else:
+            self.scrollbar.set(self.first / total, min(1, (self.first + visible) / total))
+
+    def scroll(self, amount):
+        first = max(0, min(self.first + amount, len(self.rows) - self.visible_count()))
+        if first != self.first:
+            self.first = first
+            self.render()
+        return "break"
+
+    def on_scrollbar(self, action, value, unit=None):
+        if action == 'moveto':
+            self.first = int(float(value) * len(self.rows))
+            self.render()
+        elif action == 'scroll':
+            step = self.visible_count() if unit == 'pages' else 1
+            self.scroll(int(value) * step)
+
+    def on_mouse_wheel(self, event):
+        # Windows reports multiples of 120 per notch, macOS small deltas
+        if abs(event.delta) >= 120:
+            return self.scroll(-int(event.delta / 120) * 3)
+        return self.scroll(-event.delta)
+
+    def on_click(self, event):
+        item = self.tree.identify_row(event.y)
+        if not item or self.tree.identify_region(event.x, event.y) != "cell":
+            return None
+        index = self.first + self.slots.index(item)
+
+        # selection is kept by row index so it survives scrolling past the rendered rows
+        if event.state & self.SHIFT_MASK and self.anchor is not None:
+            low, high = sorted((self.anchor, index))
+            self.selected = set(range(low, high + 1))
+        elif event.state & self.CONTROL_MASK:
+            self.selected ^= {index}
+            self.anchor = index
+        else:
+            self.selected = {index}
+            self.anchor = index
+
+        self.tree.focus_set()
+        self.tree.focus(item)
+        self.render()
+        return "break"
+
+    def move_selection(self, step, event):
+        if not self.rows:
+            return "break"
+        current = self.anchor if self.anchor is not None else self.first - step
+        index = max(0, min(current + step, len(self.rows) - 1))
+
+        if event.state & self.SHIFT_MASK and self.selected:
+            self.selected.add(index)
+        else:
+            self.selected = {index}
+        self.anchor = index
+
+        # keep the moved-to row inside the viewport
+        visible = self.visible_count()
+        if index < self.first:
+            self.first = index
+        elif index >= self.first + visible:
+            self.first = index - visible + 1
+        self.render()
+        return "break"
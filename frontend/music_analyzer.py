@@ -1,13 +1,25 @@
 
+import os
 import re
-from tkinter import ttk, filedialog # need ttk for treeview
-from backend.chord_extractor import get_score_parts, label_consecutive_parts, extract_chords
-from backend.find_chord import get_chord_name
-from frontend.assets.virtual_keyboard import VirtualKeyboard
-from music21 import pitch
+import sys
+from tkinter import filedialog
+from backend.score_loader import ScoreLoader
+from backend.score_cache import ScoreCache
+from backend.chord_query import ChordQuery, BY_INSTRUMENT, BY_MEASURE_AND_BEAT
+from backend.chord_store import ChordTable
+from backend.startup import startup_timer, start_warm_up
+from backend.tracing import tracer, traced
+from frontend.assets.virtual_table import VirtualTable
+from frontend.assets.coalescing_worker import CoalescingWorker
 import shelve
 import customtkinter as ctk
 
+FILTER_DEBOUNCE_MS = 150
+LOAD_POLL_MS = 100
+CHORD_DEBOUNCE_MS = 120
+CHORD_POLL_MS = 15
+AUTO_KEY = "auto"  # numeral key box value that uses the detected key of each measure
+
 class MusicAnalyzer(ctk.CTk):
     def __init__(self, simplify_chords=True, simplify_numeral=True, sound=True, sustain=True, free_play=False):
         super().__init__()
@@ -35,9 +47,26 @@ class MusicAnalyzer(ctk.CTk):
         self.sound_var = ctk.BooleanVar(value=True)
         self.free_play_var = ctk.BooleanVar(value=False)
         self.sustain_var = ctk.BooleanVar(value=True)
+        self.sonorities_var = ctk.BooleanVar(value=False)
         self.persistent_key_var = ctk.BooleanVar(value=False)
         self.persistent_key = ""
-        self.music_data = []
+        self.music_data = ChordTable()
+        self.rows_simplified = simplify_chords
+        self.simplified_names = {}  # notes -> simplified name, for rows extracted without the simplifier
+        self.numeral_key = ""
+        self.numerals = {}  # (notes, key) -> numeral
+        self.measure_keys = {}  # measure number -> detected key of the loaded score
+        self.numeral_job = None
+        self.chord_query = ChordQuery(self.music_data)
+        self.progression_index = None  # built on the first progression search after the rows change
+        self.filter_job = None
+        self.chord_worker = CoalescingWorker(evaluate_chord, name='chord-finder')
+        self.chord_request = None  # last input handed to the chord worker
+        self.chord_job = None
+        self.chord_poll_job = None
+        self.score_cache = ScoreCache()
+        self.loader = None
+        self.load_job = None
         
         # widgets
         self.create_widgets()
@@ -48,28 +77,61 @@ class MusicAnalyzer(ctk.CTk):
         self.bind_all('<Command-z>', self.clear_notes)
         self.bind_all('<Control-z>', self.clear_notes)
         
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        # music21 is only imported once the window is up (see backend/startup.py)
+        self.after_idle(self.on_first_frame)
+
+    def on_first_frame(self):
+        startup_timer.mark("first frame")
+        startup_timer.report_when_ready()
+        
+        # chord names persist between sessions, the store is opened by the warm-up
+        start_warm_up('chord_cache', on_done=startup_timer.report_when_ready)
+        
     def load_preferences(self):
         with shelve.open('preferences') as db:
             self.dark_mode_var = ctk.BooleanVar(value = db.get('dark_mode', False))
             self.color = db.get('color', 'Orange')
             self.color_number = db.get('color_number', 0)
+            self.trace_var = ctk.BooleanVar(value = db.get('trace', False))
+        
+        # setting from the toggle, MUSIC_ANALYZER_TRACE enables tracing on its own as well
+        if self.trace_var.get():
+            tracer.enable()
+
+    def on_close(self):
+        self.cancel_loading()
+        self.chord_worker.close()
+        
+        # nothing to close if music21 never finished loading
+        find_chord = sys.modules.get('backend.find_chord')
+        if find_chord:
+            find_chord.chord_name_cache.close_store()
+        self.destroy()
 
     def save_preferences(self):
         with shelve.open('preferences', writeback=True) as db:
             db['dark_mode'] = self.dark_mode_var.get()
             db['color'] = self.color
             db['color_number'] = self.color_number
+            db['trace'] = self.trace_var.get()
     
     def create_widgets(self):
         self.header_frame = ctk.CTkFrame(self, fg_color = self._fg_color)
         self.header_frame.pack(fill=ctk.X, pady=20, padx=10)
 
-        self.load_button = ctk.CTkButton(self.header_frame, text="Load MusicXML File", command=self.load_file)
+        self.load_button = ctk.CTkButton(self.header_frame, text="Load MusicXML or MIDI File", command=self.load_file)
         self.load_button.pack(side=ctk.LEFT, padx=10)
 
         self.find_chord_button = ctk.CTkButton(self.header_frame, text="Find Chord", command=self.open_chord_finder)
         self.find_chord_button.pack(side=ctk.RIGHT, padx=10)
 
+        # loading indicator, only packed while a score is being read
+        self.load_status_label = ctk.CTkLabel(self.header_frame, text="")
+        self.load_progress = ctk.CTkProgressBar(self.header_frame, width=200)
+        self.cancel_load_button = ctk.CTkButton(self.header_frame, text="Cancel", width=80, command=self.cancel_loading)
+
         self.filters_frame = ctk.CTkFrame(self, fg_color = self._fg_color)
         self.filters_frame.pack(pady=10)
 
@@ -78,51 +140,67 @@ class MusicAnalyzer(ctk.CTk):
         self.part_label.grid(row=0, column=0, padx=25)
         self.part_entry = ctk.CTkEntry(self.filters_frame, width=200)
         self.part_entry.grid(row=0, column=1, padx=25)
-        self.part_entry.bind("<KeyRelease>", self.apply_filters)
+        self.part_entry.bind("<KeyRelease>", self.schedule_filters)
 
         # measure filters
         self.measure_from_label = ctk.CTkLabel(self.filters_frame, text="From measure:")
         self.measure_from_label.grid(row=0, column=2, padx=25)
         self.measure_from_entry = ctk.CTkEntry(self.filters_frame, width=200)
         self.measure_from_entry.grid(row=0, column=3, padx=25)
-        self.measure_from_entry.bind("<KeyRelease>", self.apply_filters)
+        self.measure_from_entry.bind("<KeyRelease>", self.schedule_filters)
 
         self.measure_until_label = ctk.CTkLabel(self.filters_frame, text="Until measure:")
         self.measure_until_label.grid(row=0, column=4, padx=25)
         self.measure_until_entry = ctk.CTkEntry(self.filters_frame, width=200)
         self.measure_until_entry.grid(row=0, column=5, padx=25)
-        self.measure_until_entry.bind("<KeyRelease>", self.apply_filters)
+        self.measure_until_entry.bind("<KeyRelease>", self.schedule_filters)
 
         # beat filters
         self.beat_from_label = ctk.CTkLabel(self.filters_frame, text="From beat:")
         self.beat_from_label.grid(row=1, column=2, padx=25)
         self.beat_from_entry = ctk.CTkEntry(self.filters_frame, width=200)
         self.beat_from_entry.grid(row=1, column=3, padx=25)
-        self.beat_from_entry.bind("<KeyRelease>", self.apply_filters)
+        self.beat_from_entry.bind("<KeyRelease>", self.schedule_filters)
 
         self.beat_until_label = ctk.CTkLabel(self.filters_frame, text="Until beat:")
         self.beat_until_label.grid(row=1, column=4, padx=25)
         self.beat_until_entry = ctk.CTkEntry(self.filters_frame, width=200)
         self.beat_until_entry.grid(row=1, column=5, padx=25)
-        self.beat_until_entry.bind("<KeyRelease>", self.apply_filters)
+        self.beat_until_entry.bind("<KeyRelease>", self.schedule_filters)
 
         # chord name filter
         self.chord_label = ctk.CTkLabel(self.filters_frame, text="Chord Name:")
         self.chord_label.grid(row=1, column=0, padx=25)
         self.chord_entry = ctk.CTkEntry(self.filters_frame, width=200)
         self.chord_entry.grid(row=1, column=1, padx=25)
-        self.chord_entry.bind("<KeyRelease>", self.apply_filters)
+        self.chord_entry.bind("<KeyRelease>", self.schedule_filters)
+
+        # key for the numeral column
+        self.numeral_key_label = ctk.CTkLabel(self.filters_frame, text="Numerals in key:")
+        self.numeral_key_label.grid(row=2, column=0, padx=25)
+        self.numeral_key_entry = ctk.CTkEntry(self.filters_frame, width=200, placeholder_text=f"e.g. G, or {AUTO_KEY}")
+        self.numeral_key_entry.grid(row=2, column=1, padx=25)
+        self.numeral_key_entry.bind("<KeyRelease>", self.schedule_numerals)
+
+        # progression search, in any key
+        self.progression_label = ctk.CTkLabel(self.filters_frame, text="Progression:")
+        self.progression_label.grid(row=2, column=2, padx=25)
+        self.progression_entry = ctk.CTkEntry(self.filters_frame, width=200, placeholder_text="e.g. ii V7 I")
+        self.progression_entry.grid(row=2, column=3, padx=25)
+        self.progression_entry.bind("<KeyRelease>", self.schedule_filters)
 
         frame = ctk.CTkFrame(self)
         frame.pack(padx=10, fill=ctk.BOTH, expand=True)
 
-        # table
-        self.tree = ttk.Treeview(frame, columns=("Part", "Measure", "Beat", "Chord Name", "Notes"), show="headings")
-        self.tree.configure(selectmode="extended")
+        # table, only the rows in view are materialised
+        self.table = VirtualTable(frame, columns=("Part", "Measure", "Beat", "Chord Name", "Numeral", "Notes"), format_row=self.format_row)
+        self.table.pack(fill=ctk.BOTH, expand=True)
+        self.tree = self.table.tree
         self.tree.heading("Part", text="Part")
         self.tree.heading("Measure", text="Measure")
         self.tree.heading("Beat", text="Beat")
         self.tree.heading("Chord Name", text="Chord Name")
+        self.tree.heading("Numeral", text="Numeral")
         self.tree.heading("Notes", text="Notes (low to high)")
         
         # column widths and stretch
@@ -130,8 +208,8 @@ class MusicAnalyzer(ctk.CTk):
         self.tree.column("Measure", width=80, stretch=ctk.NO)
         self.tree.column("Beat", width=80, stretch=ctk.NO)
         self.tree.column("Chord Name", width=400, stretch=ctk.YES)
+        self.tree.column("Numeral", width=100, stretch=ctk.NO)
         self.tree.column("Notes", width=200, stretch=ctk.YES)      
-        self.tree.pack(fill=ctk.BOTH, expand=True)
         self.tree.tag_configure("padding", font=("Arial", 16))
         
         self.tree.bind("<Double-1>", self.on_tree_double_click)
@@ -148,6 +226,15 @@ class MusicAnalyzer(ctk.CTk):
         )
         self.toggle_button.pack(side=ctk.LEFT, padx=10, pady=10)
         
+        # sonorities toggle
+        self.sonorities_toggle = ctk.CTkCheckBox(
+            self.toggle_frame,
+            text="Combine Notes Across Parts",
+            command=self.toggle_sonorities,
+            variable=self.sonorities_var
+        )
+        self.sonorities_toggle.pack(side=ctk.LEFT, padx=10, pady=10)
+        
         # darkmode toggle
         self.toggle_frame = ctk.CTkFrame(self, fg_color = self._fg_color)
         self.toggle_frame.pack(side=ctk.RIGHT, padx=10, pady=10)
@@ -160,8 +247,17 @@ class MusicAnalyzer(ctk.CTk):
         )
         self.dark_mode_toggle.pack(side=ctk.RIGHT, padx=10, pady=10)
         
+        # performance trace toggle, written out when the app closes
+        self.trace_toggle = ctk.CTkCheckBox(
+            self.toggle_frame,
+            text="Record Performance Trace",
+            command=self.toggle_trace,
+            variable=self.trace_var
+        )
+        self.trace_toggle.pack(side=ctk.RIGHT, padx=10, pady=10)
+        
         # dropdown
-        self.filter_options = ["By Instrument", "By Measure and Beat"]
+        self.filter_options = [BY_INSTRUMENT, BY_MEASURE_AND_BEAT]
         self.filter_var = ctk.StringVar(value=self.filter_options[0])
         
         self.filter_dropdown = ctk.CTkComboBox(
@@ -182,6 +278,13 @@ class MusicAnalyzer(ctk.CTk):
         self.filter_var.set(selected_value)
         self.apply_filters()
 
+    def toggle_trace(self):
+        if self.trace_var.get():
+            tracer.enable()
+        else:
+            tracer.disable()
+        self.save_preferences()
+
     def toggle_dark_mode(self):
         dark_mode_enabled = self.dark_mode_var.get()
         if dark_mode_enabled:
@@ -198,96 +301,213 @@ class MusicAnalyzer(ctk.CTk):
         
     def load_file(self):
         file_path = filedialog.askopenfilename(
-            filetypes=[("MusicXML Files", "*.musicxml"), ("All Files", "*.*")]
+            filetypes=[("MusicXML Files", "*.musicxml"), ("MIDI Files", "*.mid *.midi"), ("All Files", "*.*")]
         )
         
         if file_path:
             self.file_path = file_path
-            parts = get_score_parts(file_path)
-            if parts:
-                # make sure it only has new data
-                self.music_data = []
-                self.chords = []
-                
-                label_consecutive_parts(parts)
-                self.chords = extract_chords(parts)
+            self.start_loading(file_path)
+
+    # parsing happens on a ScoreLoader thread, finished parts are polled into the table from after() callbacks
+    @traced('load_file')
+    def start_loading(self, file_path):
+        # a newer file replaces whatever is still loading
+        self.cancel_loading()
+
+        self.music_data = ChordTable()
+        self.rows_simplified = self.simplify_chords
+        self.simplified_names = {}
+        self.numerals = {}
+        self.measure_keys = {}
+        self.chord_query = ChordQuery(self.music_data)
+        self.progression_index = None
+        self.apply_filters()
 
+        self.loader = ScoreLoader(file_path, self.simplify_chords, self.score_cache, sonorities=self.sonorities_var.get(), detect_keys=True, simplified_names=True)
+        self.loader.start()
+        self.show_progress(os.path.basename(file_path), 0)
+        self.load_job = self.after(LOAD_POLL_MS, self.poll_loader)
+
+    def poll_loader(self):
+        self.load_job = None
+        loader = self.loader
+        if loader is None:
+            return
+
+        received = False
+        finished = False
+        for kind, payload in loader.poll():
+            if kind == 'rows':
+                progress, rows = payload
+                self.music_data.extend(rows)
+                received = True
+                self.show_progress(os.path.basename(loader.score_path), progress)
+            elif kind == 'names':
+                self.simplified_names.update(payload)
                 if self.simplify_chords:
-                    for chord in self.chords:
-                        part, measure_number, offset, chord_name, notes = chord
-                        notes_list = notes.split(", ")
-                        simplified_chord_name, _ = get_chord_name(notes_list, self.simplify_numeral, simplify_chords=True)
-                        self.music_data.append((part, measure_number, offset, simplified_chord_name, notes))
-                    self.chords = self.music_data
-                else:
-                    for chord in self.chords:
-                        part, measure_number, offset, chord_name, notes = chord
-                        self.music_data.append((part, measure_number, offset, chord_name, notes))
-                
-                self.music_data = self.chords                 
-                self.apply_filters(self.chords)
-                
-    def apply_filters(self, event=None):
-        selected_filter = self.filter_var.get()
-        if selected_filter == "By Instrument":
-            
-            filtered_chords = self.apply_filters_helper(self.music_data)         
-            self.update_table(filtered_chords)
-        
-        elif selected_filter == "By Measure and Beat":
-            sorted_data = sorted(self.music_data, key=lambda x: (x[1], x[2]))
-             
-            filtered_chords = self.apply_filters_helper(sorted_data)         
-            self.update_table(filtered_chords)
-    
-    def apply_filters_helper(self, data):
-        part_filter = self.part_entry.get().lower()
-        measure_from_filter = self.measure_from_entry.get()
-        measure_until_filter = self.measure_until_entry.get()
-        beat_from_filter = self.beat_from_entry.get()
-        beat_until_filter = self.beat_until_entry.get()
-        chord_filter = self.chord_entry.get().lower()
-
-        filtered_chords = [chord for chord in data
-                        if (part_filter in chord[0].partName.lower() if part_filter else True) and
-                            (measure_from_filter.isdigit() and int(measure_from_filter) <= chord[1] or not measure_from_filter) and
-                            (measure_until_filter.isdigit() and chord[1] <= int(measure_until_filter) or not measure_until_filter) and
-                            (beat_from_filter.isdigit() and int(beat_from_filter) <= chord[2] or not beat_from_filter) and
-                            (beat_until_filter.isdigit() and chord[2] <= int(beat_until_filter) or not beat_until_filter) and
-                            (chord_filter in chord[3].lower() if chord_filter else True)]
-        return filtered_chords
-             
-
-    def update_table(self, chords):
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        for part, measure_number, offset, chord_name, notes in chords:
-            part_name = part.partName or "Unknown Part"
-            
-            if self.simplify_chords:
-                notes_list = notes.split(", ")
-                simplified_chord_name, _ = get_chord_name(notes_list, self.simplify_numeral, simplify_chords=True)
-                chord_name = simplified_chord_name  # replace chord_name with the new simplified name
-            self.tree.insert("", "end", values=(part_name, measure_number, offset, chord_name, notes), tags=("padding"))
+                    received = True
+            elif kind == 'keys':
+                self.measure_keys = payload
+                if self.auto_key():
+                    self.numerals = {}
+                    received = True
+            elif kind == 'error':
+                print(f"An error occurred: {payload}")
+                finished = True
+            else:
+                finished = True
+
+        # only the new rows are indexed, the progression index is built from the whole score once it's in
+        if finished:
+            self.progression_index = None
+            received = received or bool(self.progression_entry.get().strip())
+        if received:
+            self.chord_query.extend()
+            self.apply_filters(keep_position=True)
+
+        if finished:
+            self.loader = None
+            self.hide_progress()
+        else:
+            self.load_job = self.after(LOAD_POLL_MS, self.poll_loader)
+
+    # rows that already arrived stay in the table
+    def cancel_loading(self):
+        if self.loader is not None:
+            self.loader.cancel()
+            self.loader = None
+        if self.load_job is not None:
+            self.after_cancel(self.load_job)
+            self.load_job = None
+        self.hide_progress()
+
+    def show_progress(self, file_name, progress):
+        self.load_status_label.configure(text=f"Loading {file_name}...")
+        if progress is None:
+            # stream engine, total unknown
+            if self.load_progress.cget("mode") != "indeterminate":
+                self.load_progress.configure(mode="indeterminate")
+                self.load_progress.start()
+        else:
+            if self.load_progress.cget("mode") != "determinate":
+                self.load_progress.stop()
+                self.load_progress.configure(mode="determinate")
+            self.load_progress.set(progress)
+
+        if not self.load_progress.winfo_ismapped():
+            self.load_status_label.pack(side=ctk.LEFT, padx=10)
+            self.load_progress.pack(side=ctk.LEFT, padx=10)
+            self.cancel_load_button.pack(side=ctk.LEFT, padx=10)
+
+    def hide_progress(self):
+        self.load_progress.stop()
+        self.load_status_label.pack_forget()
+        self.load_progress.pack_forget()
+        self.cancel_load_button.pack_forget()
+
+    # a burst of typing in the filter boxes only runs one query
+    def schedule_filters(self, event=None):
+        if self.filter_job is not None:
+            self.after_cancel(self.filter_job)
+        self.filter_job = self.after(FILTER_DEBOUNCE_MS, self.apply_filters)
+
+    def schedule_numerals(self, event=None):
+        if self.numeral_job is not None:
+            self.after_cancel(self.numeral_job)
+        self.numeral_job = self.after(FILTER_DEBOUNCE_MS, self.update_numeral_key)
+
+    def update_numeral_key(self):
+        self.numeral_job = None
+        self.numeral_key = self.numeral_key_entry.get().strip()
+        self.numerals = {}
+        self.apply_filters(keep_position=True)
+
+    def apply_filters(self, event=None, keep_position=False):
+        if self.filter_job is not None:
+            self.after_cancel(self.filter_job)
+            self.filter_job = None
+        
+        filtered_chords = self.chord_query.filter(
+            self.filter_var.get(),
+            part=self.part_entry.get(),
+            measure_from=self.measure_from_entry.get(),
+            measure_until=self.measure_until_entry.get(),
+            beat_from=self.beat_from_entry.get(),
+            beat_until=self.beat_until_entry.get(),
+            chord=self.chord_entry.get(),
+            within=self.progression_rows(),
+        )
+        self.update_table(filtered_chords, keep_position)
+
+    # rows inside a match of the progression box, None when it's empty, nothing while it can't be read
+    def progression_rows(self):
+        pattern = self.progression_entry.get().strip()
+        if not pattern:
+            return None
+        if self.progression_index is None:
+            from backend.progression_index import ProgressionIndex
+            self.progression_index = ProgressionIndex(self.music_data)
+        try:
+            return self.progression_index.matching_rows(pattern)
+        except ValueError:
+            return set()
+
+    @traced()
+    def update_table(self, chords, keep_position=False):
+        self.table.set_rows(chords, keep_position)
+
+    # called by the table for visible rows only
+    def format_row(self, chord):
+        part_name, measure_number, offset, chord_name, notes = chord
+        
+        # rows extracted with the simplifier already carry simplified names, the others get theirs from the
+        # loader and show the raw name until then
+        if self.simplify_chords and not self.rows_simplified:
+            chord_name = self.simplified_names.get(notes, chord_name)
+        key_name = self.row_key(measure_number)
+        numeral = self.numeral(notes, key_name) if key_name else ""
+        if numeral and self.auto_key():
+            numeral = f"{key_name}: {numeral}"
+        return (part_name, measure_number, offset, chord_name, numeral, notes)
+
+    def auto_key(self):
+        return self.numeral_key.lower() == AUTO_KEY
+
+    # key the numeral column reads a row in, "" for none
+    def row_key(self, measure_number):
+        if self.auto_key():
+            return self.measure_keys.get(measure_number, "")
+        return self.numeral_key
+
+    # numerals are worked out for the rows being drawn only, and kept per (notes, key)
+    def numeral(self, notes, key_name):
+        numeral = self.numerals.get((notes, key_name))
+        if numeral is None:
+            from backend.find_chord import get_roman_numerals
+            numeral = get_roman_numerals([notes.split(", ")], key_name, self.simplify_numeral)[0]
+            self.numerals[(notes, key_name)] = numeral
+        return numeral
 
     def on_tree_double_click(self, event):
         if self.chord_finder_window and self.chord_finder_window.winfo_exists():
+            self.cancel_chord_jobs()
             self.chord_finder_window.destroy()
         
-        selected_items = self.tree.selection()
         selected_notes = []
+        key_name = ""
         
-        for item in selected_items:
-            chord_data = self.tree.item(item, 'values')
-            notes = chord_data[4]  # notes on 5th column
-            selected_notes.extend(notes.split(", "))
+        # selection is tracked by the table, rows may be scrolled out of view
+        for i in self.table.selected_indices():
+            row = self.table.rows.table_index(i)
+            selected_notes.extend(self.music_data.notes(row))
+            key_name = key_name or self.measure_keys.get(self.music_data.measures[row], "")
             
         combined_notes = ", ".join(selected_notes) # need to pass string, not list
-        self.open_chord_finder(notes=combined_notes)
+        self.open_chord_finder(notes=combined_notes, key_name=key_name)
         self.after(10, self.update_chord_name)
     
-    def open_chord_finder(self, event=None, notes=""):
+    def open_chord_finder(self, event=None, notes="", key_name=""):
+        from frontend.assets.virtual_keyboard import VirtualKeyboard
         
         self.chord_finder_window = ctk.CTkToplevel(self)
         self.chord_finder_window.title("Chord Finder")
@@ -321,6 +541,8 @@ class MusicAnalyzer(ctk.CTk):
         # Persist key if toggled to do so
         if hasattr(self, 'persistent_key') and self.persistent_key:
             self.key_entry.insert(0, self.persistent_key)
+        elif key_name: # otherwise start from the key detected around the selected chord
+            self.key_entry.insert(0, key_name)
         
         # Key persistance toggle
         self.persistent_key_checkbox = ctk.CTkCheckBox(
@@ -380,6 +602,10 @@ class MusicAnalyzer(ctk.CTk):
         )
         self.free_play_button.pack(side=ctk.LEFT, padx=30, pady=5, fill=ctk.X)
         
+        # hear the whole chord at once
+        self.play_chord_button = ctk.CTkButton(self.row1, text="Play Chord", width=120, command=self.play_chord)
+        self.play_chord_button.pack(side=ctk.LEFT, padx=30, pady=5)
+        
         self.row2 = ctk.CTkFrame(self.chord_finder_window, fg_color = self.chord_finder_window._fg_color)
         self.row2.pack(anchor='w', padx=10, pady=10, fill=ctk.X)
         
@@ -427,20 +653,34 @@ class MusicAnalyzer(ctk.CTk):
     
     def on_chord_finder_close(self):
         self.persist_key() # persist key right before closing
+        self.cancel_chord_jobs()
         if self.chord_finder_window and self.chord_finder_window.winfo_exists():
             self.chord_finder_window.destroy()
             self.chord_finder_window = None
     
     def toggle_enharmonics(self):
         self.simplify_chords = not self.simplify_chords
+        self.table.refresh()
         if self.chord_finder_window and self.chord_finder_window.winfo_exists():
             self.after(10, self.update_chord_name)
     
+    # sonorities come from a different extraction, the open score is read again
+    def toggle_sonorities(self):
+        if getattr(self, 'file_path', None):
+            self.start_loading(self.file_path)
+
     def toggle_numeral(self):
         self.simplify_numeral = not self.simplify_numeral
+        if self.numeral_key:
+            self.numerals = {}
+            self.apply_filters(keep_position=True)
         if self.chord_finder_window and self.chord_finder_window.winfo_exists():
             self.after(10, self.update_chord_name)
     
+    def play_chord(self):
+        notes = [normalize_note(n.strip()) for n in self.notes_entry.get().split(",") if n.strip()]
+        self.virtual_keyboard.play_chord(notes)
+
     def toggle_sound(self):
         self.sound = not self.sound
         self.virtual_keyboard.toggle_sound(self.sound)
@@ -466,10 +706,9 @@ class MusicAnalyzer(ctk.CTk):
             self.virtual_keyboard.last_clicked_note = None
             self.update_chord_name()
         
+    # typed input waits for a pause, clicks and toggles are evaluated straight away
     def update_chord_name(self, event=None, keyboard_triggered=False):
-        
         notes_input = self.notes_entry.get().strip()
-        key_input = self.key_entry.get().strip()
         
         last_clicked_note = self.virtual_keyboard.last_clicked_note
         if keyboard_triggered and not self.free_play:
@@ -494,41 +733,97 @@ class MusicAnalyzer(ctk.CTk):
             self.notes_entry.delete(0, 'end')
             self.notes_entry.insert(0, notes_input)
         
-        notes_list = [note.strip() for note in notes_input.split(',') if note.strip()]
-        note_set = set(notes_list)
-        
-        chord_name, chord_relation = get_chord_name(note_set, key_input, self.simplify_numeral, self.simplify_chords)
-        
-        self.chord_name_display.configure(text=chord_name)
-        if chord_relation:
-            # split the chord_relation text into relationship and diatonic parts
-            parts = chord_relation.split('\n', 1)
-            if len(parts) == 2:
-                relationship, diatonic = parts
-            else:
-                relationship = parts[0]
-                diatonic = ""  
+        if self.chord_job is not None:
+            self.after_cancel(self.chord_job)
+            self.chord_job = None
+        if event is not None:
+            self.chord_job = self.after(CHORD_DEBOUNCE_MS, self.submit_chord)
         else:
-            relationship = "No valid key and/or chord provided"
-            diatonic = ""
-        
+            self.submit_chord()
+    
+    # hands the current input to the worker, anything it was still holding is dropped
+    def submit_chord(self):
+        self.chord_job = None
+        if not (self.chord_finder_window and self.chord_finder_window.winfo_exists()):
+            return
+        
+        notes_list = [note.strip() for note in self.notes_entry.get().strip().split(',') if note.strip()]
+        request = (tuple(notes_list), self.key_entry.get().strip(), self.simplify_numeral, self.simplify_chords)
+        if request == self.chord_request:
+            return # arrow keys, shift and the like don't change the input
+        self.chord_request = request
+        self.chord_worker.submit(*request)
+        
+        if self.chord_poll_job is None:
+            self.chord_poll_job = self.after(CHORD_POLL_MS, self.poll_chord)
+    
+    # results are applied on the Tk thread, the worker only keeps the one for the newest input
+    def poll_chord(self):
+        self.chord_poll_job = None
+        if not (self.chord_finder_window and self.chord_finder_window.winfo_exists()):
+            return
+        
+        finished, result = self.chord_worker.poll()
+        if not finished:
+            self.chord_poll_job = self.after(CHORD_POLL_MS, self.poll_chord)
+            return
+        if result is None:
+            return # evaluation failed, the error was printed
+        
+        chord_name, relationship, diatonic, highlighted = result
+        self.chord_name_display.configure(text=chord_name)
         self.chord_relation_display.configure(text=relationship)
         self.chord_diatonic_display.configure(text=diatonic)
         
-        # reset key colors before highlighting new ones
-        self.virtual_keyboard.reset_all_keys()       
-        
-        pitch_list = [] 
-        for note in note_set:
-            normalized_note = normalize_note(note)
+        if highlighted is None:
+            # nothing stays highlighted for input that isn't a note
+            self.virtual_keyboard.reset_all_keys()
+        else:
+            # only keys that changed are redrawn
+            self.virtual_keyboard.set_highlighted(highlighted)
+    
+    def cancel_chord_jobs(self):
+        for job in (self.chord_job, self.chord_poll_job):
+            if job is not None:
+                self.after_cancel(job)
+        self.chord_job = None
+        self.chord_poll_job = None
+        self.chord_request = None
+
+# runs on the chord finder's worker thread, so it only computes and never touches widgets
+# (chord name, relationship, diatonic text, notes to highlight or None for input that isn't a note)
+@traced()
+def evaluate_chord(notes_list, key_input, simplify_numeral, simplify_chords):
+    from backend.find_chord import get_chord_name
+    from music21 import pitch
+    
+    note_set = set(notes_list)
+    chord_name, chord_relation = get_chord_name(note_set, key_input, simplify_numeral, simplify_chords)
+    
+    if chord_relation:
+        # split the chord_relation text into relationship and diatonic parts
+        parts = chord_relation.split('\n', 1)
+        if len(parts) == 2:
+            relationship, diatonic = parts
+        else:
+            relationship = parts[0]
+            diatonic = ""  
+    else:
+        relationship = "No valid key and/or chord provided"
+        diatonic = ""
+    
+    pitch_list = [] 
+    for note in note_set:
+        normalized_note = normalize_note(note)
+        try:
             p = pitch.Pitch(normalized_note)
-            pitch_list.append(p) 
-
-        # simplify the pitch list (for notes with 2+ accidentals)
-        simplified_notes = [str(p.simplifyEnharmonic(mostCommon=True)) for p in pitch_list]
+        except Exception:
+            return chord_name, relationship, diatonic, None
+        pitch_list.append(p) 
 
-        for note in simplified_notes:
-            self.virtual_keyboard.highlight_key(note)
+    # simplify the pitch list (for notes with 2+ accidentals)
+    simplified_notes = [str(p.simplifyEnharmonic(mostCommon=True)) for p in pitch_list]
+    return chord_name, relationship, diatonic, simplified_notes
             
 def normalize_note(note):
     # music21 needs capitalized note names
@@ -549,6 +844,7 @@ def normalize_note(note):
 
 # get any shift clicked equivalent notes
 def get_equivalent_notes(note):
+    from music21 import pitch
     equivalent_notes = []
     
     possible_spellings = pitch.Pitch(note).getAllCommonEnharmonics(alterLimit=4)
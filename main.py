@@ -1,7 +1,25 @@
-from frontend.music_analyzer import MusicAnalyzer
+import multiprocessing
+import sys
+from backend.startup import startup_timer
+
+if '--startup-report' in sys.argv:
+    startup_timer.enabled = True
+
+# python main.py --serve [options] runs the headless chord server instead of the window
+if __name__ == "__main__" and '--serve' in sys.argv:
+    from backend.server import main as serve
+    multiprocessing.freeze_support()
+    sys.exit(serve([arg for arg in sys.argv[1:] if arg not in ('--serve', '--startup-report')]))
 
 def main():
+    # chord naming may start worker processes, which a bundled executable has to route back here
+    multiprocessing.freeze_support()
+    # imported here, worker processes run this file as well and have no use for the interface
+    from frontend.music_analyzer import MusicAnalyzer
+    startup_timer.mark("interface imported")
+
     app = MusicAnalyzer()
+    startup_timer.mark("window created")
     app.mainloop()
 
 if __name__ == "__main__":